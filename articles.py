@@ -0,0 +1,133 @@
+from collections.abc import Sequence
+
+import numpy as np
+
+# Compact in-memory layout of a cluster's articles and summaries. A cluster holds its articles as
+# three columns (titles, urls and int8 collection codes) instead of one dict per article, and each
+# *_summary as a __slots__ record. Strings are de-duplicated per week through a StringTable, so a
+# headline syndicated to many outlets, or a summary pointing at an article of the cluster, is stored
+# once. Both read like the dicts they replace (article['title'], summary.get('article')), so code
+# written against the JSON records keeps working.
+
+
+class StringTable:
+    # Per-week interning: unlike sys.intern, the strings are freed together with the week.
+
+    def __init__(self):
+        self._strings = {}
+
+    def __call__(self, value):
+        if value is None:
+            return None
+        return self._strings.setdefault(value, value)
+
+
+class Article:
+    __slots__ = ('title', 'url', 'collection')
+
+    def __init__(self, title, url, collection):
+        self.title = title
+        self.url = url
+        self.collection = collection
+
+    def __getitem__(self, key):
+        if key not in Article.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in Article.__slots__ else default
+
+    def __repr__(self):
+        return f'Article({self.title!r}, {self.url!r}, {self.collection!r})'
+
+    def to_dict(self):
+        return {'title': self.title, 'url': self.url, 'collection': self.collection}
+
+
+class ArticleList(Sequence):
+    # The articles of one cluster. Indexing and iteration create Article records on the fly;
+    # code that only needs one field should read the titles, urls or codes columns directly.
+    __slots__ = ('titles', 'urls', 'codes', 'names')
+
+    def __init__(self, titles, urls, codes, names):
+        self.titles = titles
+        self.urls = urls
+        # codes is an int8 array of positions in names, the collection registry in helpers.py.
+        self.codes = codes
+        self.names = names
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ArticleList(self.titles[index], self.urls[index], self.codes[index], self.names)
+        return Article(self.titles[index], self.urls[index], self.names[self.codes[index]])
+
+    def __iter__(self):
+        names = self.names
+        for title, url, code in zip(self.titles, self.urls, self.codes.tolist()):
+            yield Article(title, url, names[code])
+
+    def __repr__(self):
+        return f'ArticleList({len(self)} articles)'
+
+    @property
+    def collections(self):
+        names = self.names
+        return [names[code] for code in self.codes.tolist()]
+
+    def select(self, collections, exclude=False):
+        # Articles whose collection is in collections (or, with exclude, is not), in their original order.
+        wanted = [self.names.index(name) for name in collections if name in self.names]
+        mask = np.isin(self.codes, wanted, invert=exclude)
+        indices = np.flatnonzero(mask).tolist()
+        return ArticleList([self.titles[i] for i in indices], [self.urls[i] for i in indices],
+                           self.codes[mask], self.names)
+
+
+class Summary:
+    # One *_summary record. Fields other than the usual three are kept in extra.
+    __slots__ = ('article', 'image_url', 'total_num_articles', 'extra')
+    FIELDS = ('article', 'image_url', 'total_num_articles')
+
+    def __init__(self, article=None, image_url=None, total_num_articles=None, extra=None):
+        self.article = article
+        self.image_url = image_url
+        self.total_num_articles = total_num_articles
+        self.extra = extra
+
+    @classmethod
+    def from_record(cls, record, intern=None):
+        if record is None:
+            return None
+        intern = intern or StringTable()
+        article = record.get('article')
+        if isinstance(article, dict) and set(article) <= set(Article.__slots__):
+            article = Article(intern(article.get('title')), intern(article.get('url')), article.get('collection'))
+        extra = {key: value for key, value in record.items() if key not in cls.FIELDS} or None
+        return cls(article, intern(record.get('image_url')), record.get('total_num_articles'), extra)
+
+    def __getitem__(self, key):
+        if key in Summary.FIELDS:
+            return getattr(self, key)
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in Summary.FIELDS or (self.extra is not None and key in self.extra)
+
+    def to_dict(self):
+        record = dict(self.extra or {})
+        record['article'] = self.article.to_dict() if isinstance(self.article, Article) else self.article
+        record['image_url'] = self.image_url
+        record['total_num_articles'] = self.total_num_articles
+        return record
@@ -0,0 +1,140 @@
+from bisect import bisect_left
+
+import numpy as np
+
+from data_store import WeekIndex, register_week_index
+from helpers import collections, week_collection_counts
+from week_catalog import week_sort_key
+
+
+class AttentionMatrix(WeekIndex):
+    # Article counts by week x collection for every week the store has read, kept in date order,
+    # with each week's clusters x collections counts as per-cluster detail. A week is added as soon
+    # as the store reads it and a changed week file drops its row, so the matrix grows one row at a
+    # time and never needs rebuilding.
+    # Prefix sums over the rows turn the totals of any run of consecutive weeks into one subtraction.
+
+    def __init__(self):
+        super().__init__()
+        self.weeks = []
+        self._keys = []
+        self.counts = np.zeros((0, len(collections)), dtype=np.int64)
+        # Number of clusters with at least one article from each collection.
+        self.clusters = np.zeros((0, len(collections)), dtype=np.int64)
+        self.cluster_names = {}
+        self.cluster_counts = {}
+        self._prefix = None
+
+    def build(self, week, clusters):
+        return [cluster['name'] for cluster in clusters], week_collection_counts(clusters)
+
+    def store(self, week, entry):
+        self.cluster_names[week], cluster_counts = entry
+        self.cluster_counts[week] = cluster_counts
+        key = week_sort_key(week)
+        row = bisect_left(self._keys, key)
+        self.weeks.insert(row, week)
+        self._keys.insert(row, key)
+        self.counts = np.insert(self.counts, row, cluster_counts.sum(axis=0), axis=0)
+        self.clusters = np.insert(self.clusters, row, (cluster_counts > 0).sum(axis=0), axis=0)
+        self._prefix = None
+
+    def drop(self, week):
+        row = self.weeks.index(week)
+        del self.weeks[row], self._keys[row]
+        self.counts = np.delete(self.counts, row, axis=0)
+        self.clusters = np.delete(self.clusters, row, axis=0)
+        del self.cluster_names[week], self.cluster_counts[week]
+        self._prefix = None
+
+    def snapshot(self, weeks=None):
+        # (weeks, counts) for the requested weeks that are in the matrix, in week order.
+        with self._lock:
+            if weeks is None:
+                return list(self.weeks), self.counts.copy()
+            wanted = set(weeks)
+            rows = [row for row, week in enumerate(self.weeks) if week in wanted]
+            return [self.weeks[row] for row in rows], self.counts[rows]
+
+    def _prefix_sums(self):
+        if self._prefix is None:
+            zeros = np.zeros((1, len(collections)), dtype=np.int64)
+            self._prefix = (np.concatenate([zeros, self.counts.cumsum(axis=0)]),
+                            np.concatenate([zeros, self.clusters.cumsum(axis=0)]))
+        return self._prefix
+
+    def rollup(self, weeks):
+        # Summed article and cluster counts per collection over weeks; weeks missing from the matrix
+        # count as zero and a repeated week counts once.
+        with self._lock:
+            keys = sorted(week_sort_key(week) for week in weeks)
+            rows = [bisect_left(self._keys, key) for key in keys]
+            if rows and rows == list(range(rows[0], rows[0] + len(rows))) and rows[-1] < len(self._keys) and \
+                    all(self._keys[row] == key for row, key in zip(rows, keys)):
+                # Every week is in the matrix, once, and together they are a run of consecutive rows.
+                counts, clusters = self._prefix_sums()
+                return counts[rows[-1] + 1] - counts[rows[0]], clusters[rows[-1] + 1] - clusters[rows[0]]
+            wanted = set(weeks)
+            selected = [row for row, week in enumerate(self.weeks) if week in wanted]
+            return self.counts[selected].sum(axis=0), self.clusters[selected].sum(axis=0)
+
+    def top_cluster(self, week, collection):
+        # Name and count of the cluster with the most articles from collection in week.
+        with self._lock:
+            counts = self.cluster_counts.get(week)
+            if counts is None or not len(counts):
+                return None, 0
+            column = counts[:, collections.index(collection)]
+            row = int(column.argmax())
+            return self.cluster_names[week][row], int(column[row])
+
+
+class Rollup:
+    # Totals of a range of weeks: articles and clusters (summed over the weeks) per collection.
+    __slots__ = ('label', 'weeks', 'articles', 'clusters', 'total_articles')
+
+    def __init__(self, label, weeks, articles, clusters):
+        self.label = label
+        self.weeks = weeks
+        self.articles = dict(zip(collections, articles.tolist()))
+        self.clusters = dict(zip(collections, clusters.tolist()))
+        self.total_articles = int(articles.sum())
+
+
+def shares(counts):
+    # Each week's counts as a fraction of that week's articles.
+    totals = counts.sum(axis=1, keepdims=True)
+    return np.divide(counts, totals, out=np.zeros(counts.shape, dtype=float), where=totals > 0)
+
+
+def get_attention(data, weeks=None):
+    # The matrix rows for weeks, or for the whole archive.
+    weeks = list(data) if weeks is None else weeks
+    attention_matrix.ensure_weeks(data, weeks)
+    return attention_matrix.snapshot(weeks)
+
+
+def get_rollup(data, start_week, end_week, label=None):
+    weeks = data.catalog.between(start_week, end_week)
+    attention_matrix.ensure_weeks(data, weeks)
+    return Rollup(label or f"{start_week} - {end_week}", weeks, *attention_matrix.rollup(weeks))
+
+
+def get_week_rollups(data, weeks):
+    # One Rollup per week, labelled with the week.
+    attention_matrix.ensure_weeks(data, weeks)
+    return [Rollup(week, [week], *attention_matrix.rollup([week])) for week in weeks]
+
+
+def get_period_rollups(data, period):
+    # One Rollup per month, quarter or year of the archive, each week counted in the period it starts in.
+    catalog = data.catalog
+    attention_matrix.ensure_weeks(data, catalog.dated_weeks)
+    rollups = []
+    for label, start, end in catalog.periods(period):
+        weeks = catalog.period_weeks(start, end)
+        rollups.append(Rollup(label, weeks, *attention_matrix.rollup(weeks)))
+    return rollups
+
+
+attention_matrix = register_week_index('attention', AttentionMatrix)
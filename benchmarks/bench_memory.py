@@ -0,0 +1,64 @@
+# Compares the memory held by parsed weeks in the compact layout of articles.py (column-backed
+# articles, __slots__ summaries, per-week string de-duplication) with the previous layout of one
+# dict per article and per summary. Memory is measured with tracemalloc as the bytes still
+# allocated once the weeks are loaded, not the peak while loading.
+#
+#   python benchmarks/bench_memory.py --weeks 4 --clusters 10 --articles 5000
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from helpers import iter_week, load_week
+from synthetic import write_synthetic_data
+
+
+def legacy_load_week(path):
+    # process_week's output before the compact layout: the JSON records as parsed.
+    clusters = []
+    for idx, record in enumerate(iter_week(path)):
+        for article in record['articles']:
+            article['collection'] = article['collection'].replace('_', ' ')
+        clusters.append(record)
+        if idx >= 9:
+            break
+    return clusters
+
+
+def retained(load, paths):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    weeks = [load(path) for path in paths]
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size, sum(len(cluster['articles']) for clusters in weeks for cluster in clusters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the memory of the dict and compact article layouts.')
+    parser.add_argument('--weeks', type=int, default=4)
+    parser.add_argument('--clusters', type=int, default=10)
+    parser.add_argument('--articles', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_synthetic_data(tmp, args.weeks, args.clusters, args.articles)
+        results = [(label, *retained(load, paths)) for label, load in [
+            ("dict per article", legacy_load_week),
+            ("compact (articles.py)", load_week),
+        ]]
+
+    baseline = results[0][1]
+    for label, size, num_articles in results:
+        print(f"{label:<24} {size / 1e6:8.1f} MB  {size / max(num_articles, 1):7.0f} B/article  "
+              f"{size / baseline:5.2f}x  ({num_articles} articles)")
+
+
+if __name__ == '__main__':
+    main()
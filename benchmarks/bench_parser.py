@@ -0,0 +1,99 @@
+# Compares the streaming JSONL parser in helpers.py with the pandas DataFrame round-trip
+# get_data used before, and with reading the prebuilt snapshot, on large synthetic weeks.
+#
+#   python benchmarks/bench_parser.py --clusters 200 --articles 2000
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import snapshot
+from helpers import CLUSTER_KEYS, iter_week, process_week
+
+COLLECTIONS = ["mostly_left", "somewhat_left", "center", "somewhat_right", "mostly_right"]
+WORDS = ("trump biden harris court vote election debate senate campaign rally poll economy border "
+         "policy ruling judge jury trial ohio georgia").split()
+
+
+def write_synthetic_week(path, num_clusters, num_articles, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        for cluster_id in range(num_clusters):
+            articles = [{
+                "title": " ".join(rng.choice(WORDS).title() for _ in range(10)),
+                "url": f"https://example.com/{cluster_id}/{idx}",
+                "collection": rng.choice(COLLECTIONS)
+            } for idx in range(num_articles)]
+            record = {"id": cluster_id, "name": " ".join(rng.choice(WORDS) for _ in range(6)), "articles": articles}
+            for collection in COLLECTIONS:
+                record[f"{collection}_summary"] = {
+                    "article": articles[0],
+                    "image_url": "https://example.com/image.jpg",
+                    "total_num_articles": num_clusters * num_articles
+                }
+            f.write(json.dumps(record) + "\n")
+
+
+def legacy_read_week(path):
+    import pandas as pd
+
+    json_file = pd.read_json(path_or_buf=path, lines=True)
+    week_clusters = []
+    for idx in range(len(json_file['id'])):
+        cur_item = {}
+        for key in CLUSTER_KEYS:
+            cur_item[key] = json_file[key][idx]
+        week_clusters.append(cur_item)
+    return week_clusters
+
+
+def measure(func, repeat):
+    # tracemalloc slows down Python-level allocation a lot, so memory is measured in a separate run.
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the weekly JSONL parser.')
+    parser.add_argument('--clusters', type=int, default=100)
+    parser.add_argument('--articles', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, '2024-07-08_to_2024-07-14.jsonl')
+        write_synthetic_week(path, args.clusters, args.articles)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"synthetic week: {args.clusters} clusters x {args.articles} articles ({size_mb:.1f} MB)")
+        manifest = snapshot.build(tmp, log=lambda message: None)
+        entry = manifest[os.path.basename(path)]
+
+        cases = [
+            ("pandas read_json + process_week", lambda: process_week(legacy_read_week(path))),
+            ("streaming + process_week", lambda: process_week(iter_week(path))),
+            ("snapshot", lambda: snapshot.read_week(tmp, entry)),
+            ("pandas read_json, all records", lambda: legacy_read_week(path)),
+            ("streaming, all records", lambda: list(iter_week(path))),
+        ]
+        for label, func in cases:
+            seconds, peak = measure(func, args.repeat)
+            print(f"{label:<34} {seconds * 1000:10.1f} ms  peak {peak / 1e6:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
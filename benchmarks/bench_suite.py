@@ -0,0 +1,179 @@
+# Times the load, view-model and render paths of the dashboard on a synthetic data directory
+# (see synthetic.py): get_data and the data store, the week view model, the treemap, pie and word
+# cloud builders of each page (bypassing the figure and word cloud caches), and full page renders
+# through Streamlit's AppTest. Every case reports its best time and its peak traced memory.
+#
+# Results can be saved as a baseline and later runs compared against it; a case that is slower or
+# uses more memory than the baseline by more than --tolerance makes the script exit with status 1.
+#
+#   python benchmarks/bench_suite.py --weeks 12 --clusters 50 --articles 200 --save-baseline
+#   python benchmarks/bench_suite.py --weeks 12 --clusters 50 --articles 200
+import argparse
+import json
+import os
+import runpy
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+# Nothing listens here, so image downloads fail straight away instead of going out to the network.
+IMAGE_URL = 'http://127.0.0.1:9/image.jpg'
+PAGES = ['home.py', 'pages/collection_page.py', 'pages/cluster_page.py', 'pages/dev_view.py']
+
+sys.path.insert(0, ROOT)
+
+from bench_parser import measure
+from synthetic import write_synthetic_data
+
+
+def isolate_caches(tmp):
+    # Keep the benchmark's word clouds and thumbnails out of the app's cache directories.
+    os.environ['MC_WORDCLOUD_CACHE_DIR'] = os.path.join(tmp, 'wordclouds')
+    os.environ['MC_THUMBNAIL_CACHE_DIR'] = os.path.join(tmp, 'thumbnails')
+
+
+def load_page(page, data_path):
+    # Runs a page script outside a Streamlit server (st calls are no-ops there) to get at its builders.
+    sys.argv = [page, data_path]
+    return runpy.run_path(os.path.join(ROOT, page), run_name='__bench__')
+
+
+def builder_cases(data_path):
+    import data_store
+    import view_model
+    from helpers import collection_term_frequencies, collections, get_data
+    from word_clouds import render_word_cloud_png
+
+    def load_all_weeks():
+        # A cold store per repeat, closed so that repeats do not leave directory observers running.
+        store = data_store.DataStore(data_path)
+        try:
+            data = store.get()
+            for week in data:
+                data[week]
+        finally:
+            store.close()
+
+    data = data_store.get_shared_data(data_path)
+    week = list(data)[0]
+
+    def build_week_view():
+        view_model._week_views.invalidate([week])
+        return view_model.get_week_view(data, week)
+
+    home = load_page('home.py', data_path)
+    collection_page = load_page('pages/collection_page.py', data_path)
+    cluster_page = load_page('pages/cluster_page.py', data_path)
+    week_view = view_model.get_week_view(data, week)
+    cluster = data[week][0]
+
+    def word_cloud():
+        cluster.pop('term_frequencies', None)
+        return render_word_cloud_png(collection_term_frequencies(cluster, collections))
+
+    return [
+        ("get_data", lambda: get_data(data_path)),
+        ("data store, all weeks", load_all_weeks),
+        ("week view model", build_week_view),
+        ("home: week treemap", lambda: home['create_week_treemap'](week_view, week_view.values)),
+        ("home: collection treemaps", lambda: [home['create_group_treemap'](c, week_view, week_view.collections[c].counts)
+                                               for c in collections]),
+        ("collection: treemap", lambda: collection_page['build_group_treemap'](week, collections[0])),
+        ("collection: pie chart", lambda: collection_page['build_group_pie_chart'](collections[0], week)),
+        ("cluster: pie chart", lambda: cluster_page['build_pie_chart'](week, cluster['name'], tuple(collections))),
+        ("cluster: word cloud", word_cloud),
+    ]
+
+
+def render_cases(data_path):
+    from streamlit.testing.v1 import AppTest
+
+    def render(page):
+        sys.argv = [page, data_path]
+        app = AppTest.from_file(os.path.join(ROOT, page), default_timeout=300)
+        app.run()
+        if app.exception:
+            raise RuntimeError(f"{page} raised: {app.exception[0].message}")
+
+    cases = []
+    for page in PAGES:
+        # The first render fills the process-wide caches; the rerender shows the warm cost.
+        start = time.perf_counter()
+        render(page)
+        cases.append((f"render {page} (first)", (time.perf_counter() - start, None)))
+        cases.append((f"render {page}", lambda page=page: render(page)))
+    return cases
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in ('ms', 'peak_mb'):
+            if result.get(metric) is None or not base.get(metric):
+                continue
+            ratio = result[metric] / base[metric]
+            if ratio > tolerance:
+                regressions.append(f"{name}: {metric} {base[metric]:.1f} -> {result[metric]:.1f} ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the dashboard load, view-model and render paths.')
+    parser.add_argument('--weeks', type=int, default=12)
+    parser.add_argument('--clusters', type=int, default=50)
+    parser.add_argument('--articles', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--data', help='Benchmark an existing data directory instead of synthetic data.')
+    parser.add_argument('--no-render', action='store_true', help='Skip the AppTest page renders.')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with tempfile.TemporaryDirectory() as tmp:
+        isolate_caches(tmp)
+        data_path = args.data
+        if data_path is None:
+            data_path = os.path.join(tmp, 'data')
+            write_synthetic_data(data_path, args.weeks, args.clusters, args.articles, image_url=IMAGE_URL)
+            print(f"synthetic data: {args.weeks} weeks x {args.clusters} clusters x ~{args.articles} articles")
+
+        cases = builder_cases(data_path)
+        if not args.no_render:
+            cases += render_cases(data_path)
+
+        results = {}
+        for name, case in cases:
+            if callable(case):
+                seconds, peak = measure(case, args.repeat)
+            else:
+                seconds, peak = case
+            results[name] = {'ms': seconds * 1000, 'peak_mb': None if peak is None else peak / 1e6}
+            peak_text = '' if peak is None else f"  peak {peak / 1e6:8.1f} MB"
+            print(f"{name:<44} {seconds * 1000:10.1f} ms{peak_text}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"saved baseline to {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"regressions over {args.tolerance:.2f}x the baseline:")
+            for regression in regressions:
+                print(f"    {regression}")
+            sys.exit(1)
+        print(f"no regressions over {args.tolerance:.2f}x the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# Breaks down the cold-start import cost of each page with `python -X importtime`: every page's
+# top-level imports are run in a fresh interpreter, and the report lists the direct imports and the
+# packages that account for the time. With --budget-ms the script exits with status 1 when a page's
+# imports take longer than the budget (best of --repeat runs), so it can gate CI or a deploy.
+#
+#   python benchmarks/import_time.py --budget-ms 2500
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PAGES = ['home.py'] + sorted(os.path.join('pages', name) for name in os.listdir(os.path.join(ROOT, 'pages'))
+                             if name.endswith('.py'))
+
+
+def page_imports(page):
+    with open(os.path.join(ROOT, page)) as f:
+        tree = ast.parse(f.read(), page)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def parse_importtime(stderr):
+    # Rows look like "import time:  self [us] | cumulative | <indent>package"; rows with no extra
+    # indent are the modules imported directly by the measured statement.
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def measure(modules):
+    code = '\n'.join(f'import {module}' for module in modules) or 'pass'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return parse_importtime(result.stderr)
+
+
+def page_rows(page, startup):
+    # Modules the bare interpreter imports on its own (site, encodings, ...) are left out.
+    return [row for row in measure(page_imports(page)) if row[0] not in startup]
+
+
+def report(page, rows, top):
+    direct = [row for row in rows if row[3] == 0]
+    total_ms = sum(row[2] for row in direct) / 1000
+    print(f"{page}: {total_ms:.0f} ms")
+
+    for name, _, cumulative_us, _ in sorted(direct, key=lambda row: -row[2])[:top]:
+        print(f"    {name:<40} {cumulative_us / 1000:8.1f} ms")
+
+    packages = {}
+    for name, self_us, _, _ in rows:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+    heaviest = sorted(packages.items(), key=lambda item: -item[1])[:top]
+    print("    by package: " + ", ".join(f"{package} {us / 1000:.0f} ms" for package, us in heaviest))
+    return total_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report the import time of each dashboard page.')
+    parser.add_argument('pages', nargs='*', default=PAGES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=8)
+    parser.add_argument('--budget-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    startup = {row[0] for row in measure([])}
+    over_budget = []
+    for page in args.pages:
+        runs = [page_rows(page, startup) for _ in range(args.repeat)]
+        best = min(runs, key=lambda rows: sum(row[2] for row in rows if row[3] == 0))
+        total_ms = report(page, best, args.top)
+        if args.budget_ms is not None and total_ms > args.budget_ms:
+            over_budget.append(page)
+
+    if over_budget:
+        print(f"over the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
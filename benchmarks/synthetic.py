@@ -0,0 +1,103 @@
+# Writes a synthetic data directory in the schema get_data expects: one JSONL file per week, named
+# <monday>_to_<sunday>.jsonl, with one cluster per line and a *_summary record per collection.
+# Cluster sizes follow a long-tailed distribution around the requested mean, every cluster leans
+# towards some collections, and titles mix names, possessives, numbers and stopwords like headlines.
+#
+#   python benchmarks/synthetic.py /tmp/synthetic --weeks 52 --clusters 100 --articles 500
+import argparse
+import datetime
+import json
+import os
+import random
+
+COLLECTIONS = ["mostly_left", "somewhat_left", "center", "somewhat_right", "mostly_right"]
+WORDS = ("trump biden harris court vote election debate senate campaign rally poll economy border "
+         "policy ruling judge jury trial ohio georgia").split()
+NAMES = "Trump Biden Harris Vance Walz Pelosi Haley DeSantis Newsom Musk".split()
+FILLER = "the a of to in on for with after over says new as is at".split()
+START_WEEK = datetime.date(2024, 7, 8)
+IMAGE_URL = "https://example.com/image.jpg"
+
+
+def week_file_name(week_index, start=START_WEEK):
+    monday = start + datetime.timedelta(weeks=week_index)
+    return f"{monday}_to_{monday + datetime.timedelta(days=6)}.jsonl"
+
+
+def synthetic_title(rng, topic):
+    words = [rng.choice(NAMES) + rng.choice(["", "", "'s"])]
+    for _ in range(rng.randint(6, 12)):
+        roll = rng.random()
+        if roll < 0.35:
+            words.append(rng.choice(FILLER))
+        elif roll < 0.45:
+            words.append(str(rng.randint(2, 2024)))
+        elif roll < 0.7:
+            words.append(rng.choice(topic))
+        else:
+            words.append(rng.choice(WORDS))
+    return " ".join(words)
+
+
+def cluster_sizes(rng, num_clusters, mean_articles):
+    weights = [rng.paretovariate(1.5) for _ in range(num_clusters)]
+    scale = mean_articles * num_clusters / sum(weights)
+    return sorted((max(1, int(weight * scale)) for weight in weights), reverse=True)
+
+
+def synthetic_cluster(rng, week_index, cluster_id, num_articles, total_num_articles, image_url):
+    topic = rng.sample(WORDS, 4)
+    leaning = [rng.gammavariate(0.8, 1) for _ in COLLECTIONS]
+    articles = [{
+        "title": synthetic_title(rng, topic),
+        "url": f"https://example.com/{week_index}/{cluster_id}/{idx}",
+        "collection": rng.choices(COLLECTIONS, weights=leaning)[0]
+    } for idx in range(num_articles)]
+
+    record = {"id": cluster_id, "name": " ".join(topic), "articles": articles}
+    for collection in COLLECTIONS:
+        representative = next((article for article in articles if article["collection"] == collection), None)
+        record[f"{collection}_summary"] = {
+            "article": representative,
+            "image_url": image_url,
+            "total_num_articles": total_num_articles
+        }
+    return record
+
+
+def write_synthetic_week(path, num_clusters, num_articles, seed=0, week_index=0, image_url=IMAGE_URL):
+    rng = random.Random(seed * 100003 + week_index)
+    sizes = cluster_sizes(rng, num_clusters, num_articles)
+    with open(path, 'w') as f:
+        for cluster_id, size in enumerate(sizes):
+            record = synthetic_cluster(rng, week_index, cluster_id, size, sum(sizes), image_url)
+            f.write(json.dumps(record) + "\n")
+
+
+def write_synthetic_data(data_path, num_weeks, num_clusters, num_articles, seed=0, image_url=IMAGE_URL):
+    os.makedirs(data_path, exist_ok=True)
+    paths = []
+    for week_index in range(num_weeks):
+        path = os.path.join(data_path, week_file_name(week_index))
+        write_synthetic_week(path, num_clusters, num_articles, seed, week_index, image_url)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic data directory for the dashboard.')
+    parser.add_argument('data_path')
+    parser.add_argument('--weeks', type=int, default=12)
+    parser.add_argument('--clusters', type=int, default=50)
+    parser.add_argument('--articles', type=int, default=200, help='Mean number of articles per cluster.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--image-url', default=IMAGE_URL)
+    args = parser.parse_args()
+
+    paths = write_synthetic_data(args.data_path, args.weeks, args.clusters, args.articles, args.seed, args.image_url)
+    size_mb = sum(os.path.getsize(path) for path in paths) / 1e6
+    print(f"wrote {len(paths)} weeks to {args.data_path} ({size_mb:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def default_cache_dir(name):
+    return os.path.join(tempfile.gettempdir(), 'media-cloud-dashboard', name)
+
+
+class BlobCache:
+    # Byte strings (rendered PNGs, thumbnails) under content-derived keys. The most recently used
+    # ones are kept in memory up to memory_bytes; entries pushed out of memory are spilled to
+    # cache_dir, which is itself pruned, least recently used first, down to disk_bytes. With
+    # write_through every entry is written to disk as soon as it is set, so it survives a restart.
+
+    def __init__(self, cache_dir, memory_bytes, disk_bytes, suffix='', write_through=False):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.suffix = suffix
+        self.write_through = write_through
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = OrderedDict()
+        self._disk_size = 0
+        self._load_disk_index()
+
+    def _load_disk_index(self):
+        if self.disk_bytes <= 0:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entries = [entry for entry in os.scandir(self.cache_dir)
+                       if entry.is_file() and entry.name.endswith(self.suffix) and not entry.name.endswith('.tmp')]
+        except OSError:
+            self.disk_bytes = 0
+            return
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            key = entry.name[:len(entry.name) - len(self.suffix)] if self.suffix else entry.name
+            self._disk[key] = entry.stat().st_size
+            self._disk_size += entry.stat().st_size
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._memory or key in self._disk
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            on_disk = key in self._disk
+
+        if on_disk:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    value = f.read()
+                os.utime(self._path(key))
+            except OSError:
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                self._remember(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        if self.write_through:
+            self._spill(key, value)
+        self._remember(key, value)
+
+    def _remember(self, key, value):
+        spilled = []
+        with self._lock:
+            if key in self._memory:
+                self._memory_size -= len(self._memory.pop(key))
+            self._memory[key] = value
+            self._memory_size += len(value)
+            while len(self._memory) > 1 and self._memory_size > self.memory_bytes:
+                old_key, old_value = self._memory.popitem(last=False)
+                self._memory_size -= len(old_value)
+                if old_key not in self._disk:
+                    spilled.append((old_key, old_value))
+
+        for old_key, old_value in spilled:
+            self._spill(old_key, old_value)
+
+    def _spill(self, key, value):
+        if self.disk_bytes <= 0 or len(value) > self.disk_bytes:
+            return
+        path = self._path(key)
+        try:
+            with open(path + '.tmp', 'wb') as f:
+                f.write(value)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            return
+
+        pruned = []
+        with self._lock:
+            if key not in self._disk:
+                self._disk[key] = len(value)
+                self._disk_size += len(value)
+            while self._disk_size > self.disk_bytes:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+                pruned.append(old_key)
+
+        for old_key in pruned:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_size,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_size,
+            }
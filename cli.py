@@ -0,0 +1,72 @@
+import argparse
+import sys
+
+
+def build_command(args):
+    import snapshot
+
+    snapshot.build(args.data_path)
+
+
+def nltk_data_command(args):
+    import nlp_resources
+
+    if not args.check:
+        nlp_resources.download()
+    status = nlp_resources.check_resources()
+    print(f"stopwords: {status['stopwords']}, tokenizer: {status['tokenizer']} ({status['nltk_data_dir']})")
+    if args.check and (status['stopwords'], status['tokenizer']) != ('nltk', 'punkt'):
+        raise SystemExit(1)
+
+
+def export_command(args):
+    import export
+    from data_store import get_shared_data
+
+    data = get_shared_data(args.data_path)
+    collections = set(args.collection) if args.collection else None
+    if args.cluster is not None:
+        clusters = [cluster for cluster in data[args.week] if cluster['name'] == args.cluster]
+        if not clusters:
+            raise SystemExit(f"No cluster named {args.cluster!r} in {args.week}")
+        rows = export.cluster_rows(args.week, clusters[0], collections)
+    else:
+        rows = export.range_rows(data, args.week, args.to or args.week, collections)
+
+    if args.output == '-':
+        if args.format == 'parquet':
+            raise SystemExit("Parquet exports need an --output file")
+        export.write_export(rows, sys.stdout.buffer, args.format)
+    else:
+        with open(args.output, 'wb') as f:
+            export.write_export(rows, f, args.format)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Media Cloud Dashboard maintenance commands.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Compile a data directory into a binary snapshot.')
+    build_parser.add_argument('data_path')
+    build_parser.set_defaults(func=build_command)
+
+    nltk_parser = subparsers.add_parser('nltk-data', help='Download the NLTK data the dashboard uses into MC_NLTK_DATA (default ./nltk_data).')
+    nltk_parser.add_argument('--check', action='store_true', help='Only verify that the data resolves, without downloading.')
+    nltk_parser.set_defaults(func=nltk_data_command)
+
+    export_parser = subparsers.add_parser('export', help='Export the articles of a cluster, a week or a range of weeks.')
+    export_parser.add_argument('data_path')
+    export_parser.add_argument('--week', required=True, help='Week to export, or the first week of a range.')
+    export_parser.add_argument('--to', help='Last week of the range (inclusive).')
+    export_parser.add_argument('--cluster', help='Only export the cluster with this name.')
+    export_parser.add_argument('--collection', action='append', help='Only export these collections (repeatable).')
+    export_parser.add_argument('--format', choices=['csv', 'jsonl', 'parquet'], default='csv')
+    export_parser.add_argument('--output', '-o', default='-')
+    export_parser.set_defaults(func=export_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,536 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import nlp_resources
+import snapshot
+from perf import span
+from helpers import list_week_files, load_week, week_name
+from week_catalog import WeekCatalog
+
+# Without watchdog (or if the observer cannot start) the directory is re-scanned on every read.
+# With it, a scan only happens after a file event, plus a periodic safety scan for missed events.
+RESCAN_INTERVAL_SECONDS = 60
+
+# Bounds of the resident-week LRU. A byte limit of 0 means only the week count applies.
+MAX_RESIDENT_WEEKS = int(os.environ.get('MC_MAX_RESIDENT_WEEKS', 12))
+MAX_RESIDENT_BYTES = int(os.environ.get('MC_MAX_RESIDENT_BYTES', 0))
+# Weeks waiting for a background ingest hook. A week read while the queue is full is skipped (the
+# pages compute what they need on demand), so queued work never holds more weeks than the LRU does.
+MAX_QUEUED_WEEKS = MAX_RESIDENT_WEEKS
+
+
+class WeekCache:
+    # Derived per-week results (figures, word clouds, samples). The store drops the entries of a
+    # week when its file changes, so publishing one week leaves every other week's entries warm.
+
+    def __init__(self, max_entries_per_week=256):
+        self.max_entries_per_week = max_entries_per_week
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._generations = {}
+
+    def generation(self, week):
+        return self._generations.get(week, 0)
+
+    def get(self, week, key, default=None):
+        with self._lock:
+            week_entries = self._entries.get(week)
+            if week_entries is None or key not in week_entries:
+                return default
+            week_entries.move_to_end(key)
+            return week_entries[key]
+
+    def set(self, week, key, value, generation=None):
+        with self._lock:
+            # A value computed from data that was invalidated while it was being built is dropped.
+            if generation is not None and generation != self._generations.get(week, 0):
+                return
+            week_entries = self._entries.setdefault(week, OrderedDict())
+            week_entries[key] = value
+            week_entries.move_to_end(key)
+            while len(week_entries) > self.max_entries_per_week:
+                week_entries.popitem(last=False)
+
+    def invalidate(self, weeks):
+        with self._lock:
+            for week in weeks:
+                self._entries.pop(week, None)
+                self._generations[week] = self._generations.get(week, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_week_caches = {}
+_week_caches_lock = threading.Lock()
+_missing = object()
+
+
+def register_week_cache(name, factory=WeekCache):
+    # Page scripts are re-executed on every rerun, so caches are registered by name and a
+    # re-registration returns the existing cache instead of starting a cold one.
+    with _week_caches_lock:
+        if name not in _week_caches:
+            _week_caches[name] = factory()
+        return _week_caches[name]
+
+
+def invalidate_weeks(weeks):
+    with _week_caches_lock:
+        caches = list(_week_caches.values())
+    for cache in caches:
+        cache.invalidate(weeks)
+
+
+_ingest_hooks = {}
+
+
+def register_ingest_hook(name, hook):
+    # hook(week, clusters) runs each time a week is read from disk, after it is resident. It is
+    # called on the loading thread, so long-running work (such as prefetching) belongs on a pool.
+    with _week_caches_lock:
+        _ingest_hooks[name] = hook
+
+
+def run_ingest_hooks(week, clusters):
+    with _week_caches_lock:
+        hooks = list(_ingest_hooks.values())
+    for hook in hooks:
+        hook(week, clusters)
+
+
+class BackgroundHook:
+    # An ingest hook that runs hook(week, clusters) on its own single-worker pool instead of on the
+    # loading thread. A week is queued once, and only if wanted(week) says it still needs the work.
+
+    def __init__(self, name, hook, wanted=None):
+        self.hook = hook
+        self.wanted = wanted
+        self._lock = threading.Lock()
+        self._queued = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    def __call__(self, week, clusters):
+        if self.wanted is not None and not self.wanted(week):
+            return
+        with self._lock:
+            if week in self._queued or len(self._queued) >= MAX_QUEUED_WEEKS:
+                return
+            self._queued.add(week)
+        self._executor.submit(self._run, week, clusters)
+
+    def _run(self, week, clusters):
+        with self._lock:
+            self._queued.discard(week)
+        self.hook(week, clusters)
+
+
+class WeekIndex:
+    # An index over the archive with one entry per week (search postings, lineage signatures,
+    # attention counts). Registered with register_week_index, it is built up as the store reads
+    # weeks, and ensure_weeks fills in the weeks it has not seen. Each week is built once: the hook
+    # skips weeks that are indexed or being built, and ensure_weeks waits for a build in progress.
+    # Subclasses implement build(week, clusters), which runs unlocked, and store(week, entry) and
+    # drop(week), which run under self._lock.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = threading.Condition(self._lock)
+        self._indexed = set()
+        self._building = set()
+        self._generations = {}
+
+    def build(self, week, clusters):
+        raise NotImplementedError
+
+    def store(self, week, entry):
+        raise NotImplementedError
+
+    def drop(self, week):
+        raise NotImplementedError
+
+    def wanted(self, week):
+        with self._lock:
+            return week not in self._indexed and week not in self._building
+
+    def indexed_weeks(self, weeks):
+        with self._lock:
+            return [week for week in weeks if week in self._indexed]
+
+    def _claim(self, week):
+        # The generation to build week against, or None if it is indexed or being built already.
+        if week in self._indexed or week in self._building:
+            return None
+        self._building.add(week)
+        return self._generations.get(week, 0)
+
+    def _build(self, week, source, generation):
+        # Builds week from source[week] and releases the claim, even if reading or building fails.
+        entry = built = None
+        try:
+            entry, built = self.build(week, source[week]), True
+        finally:
+            with self._lock:
+                self._building.discard(week)
+                # An entry built from a week that was invalidated in the meantime is dropped.
+                if built and generation == self._generations.get(week, 0):
+                    self.store(week, entry)
+                    self._indexed.add(week)
+                self._built.notify_all()
+
+    def ingest(self, week, clusters):
+        with self._lock:
+            generation = self._claim(week)
+        if generation is not None:
+            self._build(week, {week: clusters}, generation)
+
+    def ensure_weeks(self, data, weeks):
+        for week in weeks:
+            with self._lock:
+                while week in self._building:
+                    self._built.wait()
+                generation = self._claim(week)
+            if generation is not None:
+                # Reading the week runs the ingest hooks, which skip it while it is claimed here.
+                self._build(week, data, generation)
+
+    def invalidate(self, weeks):
+        with self._lock:
+            for week in weeks:
+                if week in self._indexed:
+                    self.drop(week)
+                    self._indexed.discard(week)
+                self._generations[week] = self._generations.get(week, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            for week in list(self._indexed):
+                self.drop(week)
+            self._indexed.clear()
+
+
+def register_week_index(name, factory, background=False):
+    # Registers a WeekIndex as a week cache, so changed weeks are dropped from it, and as an ingest
+    # hook, on a background pool if building a week costs more than reading it.
+    index = register_week_cache(name, factory)
+    hook = index.ingest
+    if background:
+        hook = BackgroundHook(name, index.ingest, index.wanted)
+    register_ingest_hook(name, hook)
+    return index
+
+
+def week_cached(func):
+    # Memoises func(week, *args) in a registered WeekCache; args must be hashable.
+    cache = register_week_cache(f'{func.__code__.co_filename}:{func.__qualname__}')
+
+    def wrapper(week, *args):
+        key = args
+        value = cache.get(week, key, _missing)
+        if value is _missing:
+            generation = cache.generation(week)
+            value = func(week, *args)
+            cache.set(week, key, value, generation)
+        return value
+
+    wrapper.cache = cache
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+def file_digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+class WeekFile:
+    __slots__ = ('file_name', 'week', 'mtime_ns', 'size', 'digest')
+
+    def __init__(self, file_name, mtime_ns, size, digest=None):
+        self.file_name = file_name
+        self.week = week_name(file_name)
+        self.mtime_ns = mtime_ns
+        self.size = size
+        # Content hash of the last parsed version; None until the week has been loaded once.
+        self.digest = digest
+
+
+class DatasetView(Mapping):
+    # Read-only week -> clusters mapping handed to the pages. Keys come from the catalog, in date
+    # order, so listing weeks never parses anything; a week is only loaded when it is indexed.
+
+    def __init__(self, store, catalog):
+        self._store = store
+        self.catalog = catalog
+
+    def __getitem__(self, week):
+        if week not in self.catalog:
+            raise KeyError(week)
+        return self._store.load_week(week)
+
+    def __contains__(self, week):
+        return week in self.catalog
+
+    def __iter__(self):
+        return iter(self.catalog)
+
+    def __len__(self):
+        return len(self.catalog)
+
+
+class DataStore:
+    # One store per data directory, shared by every page and every session in the process.
+    # The week catalog is built from file names and stats alone. Weeks are parsed on first access
+    # and kept in an LRU bounded by max_resident_weeks and, if set, max_resident_bytes (measured
+    # on the size of the source files). Each weekly file is tracked by mtime, size and content hash,
+    # so a changed file only evicts and invalidates its own week.
+
+    def __init__(self, data_path, max_resident_weeks=None, max_resident_bytes=None):
+        self.data_path = data_path
+        self.max_resident_weeks = max_resident_weeks if max_resident_weeks is not None else MAX_RESIDENT_WEEKS
+        self.max_resident_bytes = max_resident_bytes if max_resident_bytes is not None else MAX_RESIDENT_BYTES
+        self._lock = threading.Lock()
+        self._files = {}
+        self._files_by_week = {}
+        self._snapshot = {}
+        self._resident_lock = threading.Lock()
+        self._resident = OrderedDict()
+        self._resident_bytes = 0
+        # Parsed version and digest of each resident week evicted because its file changed, served
+        # again if the new file cannot be parsed yet (a writer is still in the middle of it).
+        self._previous = OrderedDict()
+        self._week_locks = {}
+        self._view = DatasetView(self, WeekCatalog([]))
+        self._dirty = True
+        self._last_scan = 0.0
+        self._observer = None
+        self._start_observer()
+
+    def _start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return
+
+        store = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                paths = [getattr(event, 'src_path', ''), getattr(event, 'dest_path', '')]
+                if any(str(path).endswith('.jsonl') for path in paths):
+                    store._dirty = True
+
+        try:
+            observer = Observer()
+            observer.daemon = True
+            observer.schedule(_Handler(), self.data_path, recursive=False)
+            observer.start()
+        except OSError:
+            return
+        self._observer = observer
+
+    def close(self):
+        # Stops watching the directory; the store then re-scans it on every read.
+        observer, self._observer = self._observer, None
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+    def _needs_scan(self):
+        if self._observer is None or self._dirty:
+            return True
+        return time.monotonic() - self._last_scan > RESCAN_INTERVAL_SECONDS
+
+    def get(self):
+        if self._needs_scan():
+            with self._lock:
+                if self._needs_scan():
+                    self._dirty = False
+                    self._last_scan = time.monotonic()
+                    self._refresh()
+        return self._view
+
+    def _refresh(self):
+        files = {}
+        changed_weeks = []
+        digests = {}
+
+        for file_name in list_week_files(self.data_path):
+            path = os.path.join(self.data_path, file_name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+
+            known = self._files.get(file_name)
+            if known is not None and (known.mtime_ns, known.size) == (stat.st_mtime_ns, stat.st_size):
+                files[file_name] = known
+                continue
+
+            week_file = WeekFile(file_name, stat.st_mtime_ns, stat.st_size)
+            files[file_name] = week_file
+            if known is None or known.digest is None:
+                continue
+            digests[week_file.week] = known.digest
+
+            # Only weeks that were loaded before can have stale parsed data or derived caches.
+            with open(path, 'rb') as f:
+                digest = file_digest(f.read())
+            if digest == known.digest:
+                # Touched but identical: keep the parsed week and its derived caches.
+                week_file.digest = digest
+            else:
+                changed_weeks.append(week_file.week)
+
+        removed_weeks = [f.week for name, f in self._files.items() if name not in files]
+
+        self._files = files
+        self._files_by_week = {f.week: f for f in files.values()}
+        self._snapshot = snapshot.read_manifest(self.data_path)
+        self._view = DatasetView(self, WeekCatalog([f.week for f in files.values()]))
+
+        if changed_weeks or removed_weeks:
+            previous = self._evict(changed_weeks + removed_weeks)
+            for week in removed_weeks:
+                previous.pop(week, None)
+            with self._resident_lock:
+                for week in removed_weeks:
+                    self._previous.pop(week, None)
+                for week, clusters in previous.items():
+                    self._previous[week] = (clusters, digests[week])
+                while len(self._previous) > self.max_resident_weeks:
+                    self._previous.popitem(last=False)
+            invalidate_weeks(changed_weeks + removed_weeks)
+
+    def _evict(self, weeks):
+        # Drops weeks from the LRU; returns the clusters of those that were resident.
+        evicted = {}
+        with self._resident_lock:
+            for week in weeks:
+                entry = self._resident.pop(week, None)
+                if entry is not None:
+                    self._resident_bytes -= entry[1]
+                    evicted[week] = entry[0]
+        return evicted
+
+    def _week_lock(self, week):
+        with self._resident_lock:
+            if week not in self._week_locks:
+                self._week_locks[week] = threading.Lock()
+            return self._week_locks[week]
+
+    def _resident_get(self, week):
+        with self._resident_lock:
+            entry = self._resident.get(week)
+            if entry is None:
+                return None
+            self._resident.move_to_end(week)
+            return entry[0]
+
+    def load_week(self, week):
+        clusters = self._resident_get(week)
+        if clusters is not None:
+            return clusters
+
+        with self._week_lock(week):
+            clusters = self._resident_get(week)
+            if clusters is not None:
+                return clusters
+
+            week_file = self._files_by_week.get(week)
+            if week_file is None:
+                raise KeyError(week)
+
+            try:
+                with span('data load'):
+                    clusters, digest = self._read_week(week_file)
+            except ValueError:
+                # Half-written file: serve the version parsed before it changed, if there is one,
+                # and re-scan on the next read, so the week is parsed again once the file changes.
+                self._dirty = True
+                with self._resident_lock:
+                    previous = self._previous.get(week)
+                if previous is None:
+                    raise KeyError(week)
+                clusters, digest = previous
+
+            if week_file.digest is not None and week_file.digest != digest:
+                # Changed after the last scan: results derived from the old content are stale.
+                invalidate_weeks([week])
+                self._dirty = True
+            week_file.digest = digest
+
+            with self._resident_lock:
+                if self._previous.get(week, (None, None))[1] != digest:
+                    self._previous.pop(week, None)
+                self._resident[week] = (clusters, week_file.size)
+                self._resident_bytes += week_file.size
+                self._shrink()
+
+        run_ingest_hooks(week, clusters)
+        return clusters
+
+    def _read_week(self, week_file):
+        # Prefer the prebuilt snapshot (see snapshot.py). An unchanged size and mtime is trusted
+        # without reading the source; otherwise the snapshot is used only if the content hash matches.
+        entry = self._snapshot.get(week_file.file_name)
+        if entry is not None and (entry['size'], entry['mtime_ns']) == (week_file.size, week_file.mtime_ns):
+            clusters = self._read_snapshot_week(entry)
+            if clusters is not None:
+                return clusters, entry['sha256']
+
+        with open(os.path.join(self.data_path, week_file.file_name), 'rb') as f:
+            content = f.read()
+        digest = file_digest(content)
+
+        if entry is not None and entry['sha256'] == digest:
+            clusters = self._read_snapshot_week(entry)
+            if clusters is not None:
+                return clusters, digest
+
+        return tuple(load_week(BytesIO(content))), digest
+
+    def _read_snapshot_week(self, entry):
+        try:
+            return tuple(snapshot.read_week(self.data_path, entry))
+        except (OSError, ValueError):
+            return None
+
+    def _shrink(self):
+        # The most recently loaded week always stays resident, even if it alone exceeds the budget.
+        while len(self._resident) > 1 and (
+                len(self._resident) > self.max_resident_weeks or
+                (self.max_resident_bytes and self._resident_bytes > self.max_resident_bytes)):
+            _, (_, size) = self._resident.popitem(last=False)
+            self._resident_bytes -= size
+
+    def resident_weeks(self):
+        with self._resident_lock:
+            return list(self._resident)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(data_path):
+    key = os.path.abspath(data_path)
+    with _stores_lock:
+        if key not in _stores:
+            # Resolved once with the first store, so a missing NLTK download is reported at startup
+            # rather than on the first word cloud.
+            nlp_resources.check_resources()
+            _stores[key] = DataStore(key)
+        return _stores[key]
+
+
+def get_shared_data(data_path):
+    return get_store(data_path).get()
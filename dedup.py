@@ -0,0 +1,254 @@
+import functools
+import hashlib
+import os
+import re
+from urllib.parse import parse_qsl, urlencode
+
+import numpy as np
+
+from data_store import BackgroundHook, register_ingest_hook
+from helpers import collections
+
+# Near-duplicate detection within a cluster. The same wire story syndicated across outlets, or
+# lightly rewritten, is counted once as a "story". Articles are the same story if their normalised
+# URLs are equal, or if the word sets of their normalised titles have a Jaccard similarity of at
+# least MIN_SIMILARITY. Headlines are short, so one added or swapped word moves their 64-bit SimHash
+# fingerprints by 5-20 bits, about as far as unrelated headlines of the same cluster can be: the
+# fingerprints only pick candidate pairs, through a banded index (see near_pairs) that avoids
+# comparing every title with every other, and the word sets decide.
+# Each cluster gets unique_counts and unique_distribution next to article_counts and distribution,
+# computed in the background when the store reads a week, or on demand by the first page that needs them.
+MAX_DISTANCE = int(os.environ.get('MC_DUPLICATE_DISTANCE', 18))
+MIN_SIMILARITY = float(os.environ.get('MC_DUPLICATE_SIMILARITY', 0.5))
+FINGERPRINT_BITS = 64
+# Bands of the banded index. Two fingerprints d bits apart share one of 8 bands of 8 bits with
+# probability 1 - (1 - (1 - d/64)^8)^8: about 90% at 10 bits and 60% at 16.
+BANDS = 8
+# Titles fingerprinted per batch, which bounds the size of the features x bits vote matrix.
+SIMHASH_BATCH = 4096
+# Neighbours each title is compared with in a bucket of the banded index.
+BUCKET_WINDOW = 16
+
+_outlet_suffix = re.compile(r'\s+[-|–—]\s+[^-|–—]{1,40}$')
+_word = re.compile(r'\w+')
+_url_parts = re.compile(r'^(?:[a-z][a-z0-9+.-]*:)?//(?:www\.|m\.|amp\.)?([^/?#]+)([^?#]*)')
+_url_suffix = re.compile(r'(/amp|\.amp)?/*$')
+# Query parameters that track the click rather than name the page.
+_tracking_param = re.compile(r'^(utm_\w*|fbclid|gclid|gclsrc|dclid|gbraid|wbraid|msclkid|yclid|igshid|mc_cid|mc_eid|_ga|_gl|ocid|cmpid|smid)$')
+
+
+def normalize_title(title):
+    # Lowercase words of the title without an outlet suffix such as " - CNN" or " | Fox News".
+    return ' '.join(_word.findall(_outlet_suffix.sub('', title or '').lower()))
+
+
+def normalize_url(url):
+    # Host, path and sorted query, without scheme, "www."/"m."/"amp." prefixes, AMP suffixes,
+    # tracking parameters or fragment.
+    url = (url or '').strip()
+    match = _url_parts.match(url.lower())
+    if match is None:
+        return None
+    key = match.group(1) + _url_suffix.sub('', match.group(2))
+    query = url.partition('#')[0].partition('?')[2]
+    if query:
+        params = sorted((name, value) for name, value in parse_qsl(query, keep_blank_values=True)
+                        if not _tracking_param.match(name.lower()))
+        if params:
+            key += '?' + urlencode(params)
+    return key
+
+
+@functools.lru_cache(maxsize=2 ** 17)
+def feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'little')
+
+
+def feature_votes(hashes):
+    # +1/-1 per bit of each feature hash.
+    bits = np.unpackbits(np.array(hashes, dtype='<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    return bits.astype(np.int16) * 2 - 1
+
+
+def simhash(normalized_titles):
+    # Fingerprints of normalised titles, from their distinct words; 0 for a title without words.
+    fingerprints = np.zeros(len(normalized_titles), dtype=np.uint64)
+    for first in range(0, len(normalized_titles), SIMHASH_BATCH):
+        batch = normalized_titles[first:first + SIMHASH_BATCH]
+        vocabulary = {}
+        features = []
+        sizes = []
+        for normalized in batch:
+            words = set(normalized.split())
+            features.extend(vocabulary.setdefault(word, len(vocabulary)) for word in words)
+            sizes.append(len(words))
+        if not features:
+            continue
+        votes = feature_votes([feature_hash(word) for word in vocabulary])[features]
+        sizes = np.array(sizes)
+        has_words = sizes > 0
+        starts = (np.cumsum(sizes) - sizes)[has_words]
+        totals = np.zeros((len(batch), FINGERPRINT_BITS), dtype=np.int32)
+        totals[has_words] = np.add.reduceat(votes, starts, axis=0)
+        packed = np.packbits(totals > 0, axis=1, bitorder='little')
+        fingerprints[first:first + len(batch)] = packed.view('<u8').ravel()
+    return fingerprints
+
+
+def hamming(a, b):
+    return np.bitwise_count(a ^ b)
+
+
+def near_pairs(fingerprints, max_distance=MAX_DISTANCE, bands=BANDS, window=BUCKET_WINDOW):
+    # (i, j) index pairs, i < j, of fingerprints at most max_distance bits apart that agree on at
+    # least one of bands bands. For each band the fingerprints are sorted by band value, then by the
+    # whole fingerprint, and each one is compared with up to window following ones of the same band
+    # value, so the work is linear in the number of titles.
+    width = FINGERPRINT_BITS // bands
+    mask = np.uint64((1 << width) - 1)
+    found = []
+    for band in range(bands):
+        values = (fingerprints >> np.uint64(band * width)) & mask
+        order = np.lexsort((fingerprints, values))
+        values = values[order]
+        for offset in range(1, min(window, len(order) - 1) + 1):
+            same = np.flatnonzero(values[offset:] == values[:-offset])
+            if not len(same):
+                break
+            left, right = order[same], order[same + offset]
+            close = hamming(fingerprints[left], fingerprints[right]) <= max_distance
+            found.append(np.minimum(left, right)[close] * len(fingerprints) + np.maximum(left, right)[close])
+    keys = np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+    return np.stack([keys // len(fingerprints), keys % len(fingerprints)], axis=1)
+
+
+def word_sets(normalized_titles):
+    # (bitsets, sizes): the distinct words of each title as a row of bits over the titles' vocabulary.
+    vocabulary = {}
+    rows = []
+    ids = []
+    for row, normalized in enumerate(normalized_titles):
+        words = {vocabulary.setdefault(word, len(vocabulary)) for word in normalized.split()}
+        rows.extend([row] * len(words))
+        ids.extend(words)
+    ids = np.array(ids, dtype=np.int64)
+    bitsets = np.zeros((len(normalized_titles), max(1, -(-len(vocabulary) // 64))), dtype=np.uint64)
+    np.bitwise_or.at(bitsets, (np.array(rows, dtype=np.int64), ids // 64), np.left_shift(np.uint64(1), (ids % 64).astype(np.uint64)))
+    return bitsets, np.bitwise_count(bitsets).sum(axis=1)
+
+
+def similarities(bitsets, sizes, pairs):
+    # Jaccard similarity of the word sets of each pair of titles.
+    result = np.zeros(len(pairs))
+    batch = max(1, SIMHASH_BATCH * 256 // bitsets.shape[1])
+    for first in range(0, len(pairs), batch):
+        left, right = pairs[first:first + batch].T
+        common = np.bitwise_count(bitsets[left] & bitsets[right]).sum(axis=1)
+        result[first:first + batch] = common / np.maximum(sizes[left] + sizes[right] - common, 1)
+    return result
+
+
+class _Stories:
+    # Union-find over article positions.
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            self.parent[max(i, j)] = min(i, j)
+
+    def union_groups(self, keys):
+        # Joins the positions that share a key; None keys join nothing.
+        first = {}
+        for i, key in enumerate(keys):
+            if key is None:
+                continue
+            j = first.setdefault(key, i)
+            if j != i:
+                self.union(i, j)
+
+
+def story_ids(titles, urls, max_distance=MAX_DISTANCE, min_similarity=MIN_SIMILARITY):
+    # Story of each article: the position of the first article of its group of near-duplicates.
+    stories = _Stories(len(titles))
+    normalized = [normalize_title(title) for title in titles]
+    stories.union_groups([title or None for title in normalized])
+    stories.union_groups([normalize_url(url) for url in urls])
+
+    # Fingerprint each distinct title once; exact copies are already joined above.
+    first = {}
+    for i, title in enumerate(normalized):
+        if title:
+            first.setdefault(title, i)
+    distinct = list(first)
+    if len(distinct) > 1 and max_distance > 0:
+        positions = list(first.values())
+        pairs = near_pairs(simhash(distinct), max_distance)
+        if len(pairs):
+            close = pairs[similarities(*word_sets(distinct), pairs) >= min_similarity]
+            for a, b in close.tolist():
+                stories.union(positions[a], positions[b])
+    return np.array([stories.find(i) for i in range(len(titles))], dtype=np.int64)
+
+
+def cluster_story_ids(cluster):
+    # Story of each article of the cluster. Computed once per cluster and kept on it, together with
+    # unique_counts and unique_distribution, the de-duplicated article_counts and distribution.
+    ids = cluster.get('story_ids')
+    if ids is None:
+        articles = cluster['articles']
+        ids = story_ids(articles.titles, articles.urls).astype(np.int32)
+        num_collections = len(collections)
+        pairs = np.unique(ids.astype(np.int64) * num_collections + articles.codes)
+        counts = np.bincount(pairs % num_collections, minlength=num_collections)
+        cluster['unique_counts'] = int(len(np.unique(ids)))
+        cluster['unique_distribution'] = dict(zip(collections, counts.tolist()))
+        cluster['unique_collection_counts'] = counts
+        cluster['story_ids'] = ids
+    return ids
+
+
+def cluster_story_counts(cluster):
+    # Unique stories per collection; a story carried by several collections counts in each.
+    cluster_story_ids(cluster)
+    return cluster['unique_collection_counts']
+
+
+def unique_story_count(cluster, selected_collections):
+    # Unique stories among the articles of selected_collections.
+    ids = cluster_story_ids(cluster)
+    articles = cluster['articles']
+    wanted = [articles.names.index(name) for name in selected_collections if name in articles.names]
+    return int(len(np.unique(ids[np.isin(articles.codes, wanted)])))
+
+
+def week_story_counts(clusters):
+    # Clusters x collections matrix of unique stories, like helpers.week_collection_counts.
+    return np.array([cluster_story_counts(cluster) for cluster in clusters]).reshape(-1, len(collections))
+
+
+def count_week(week, clusters):
+    week_story_counts(clusters)
+
+
+def count_unique_toggle(key):
+    # Raw or de-duplicated counts for the charts of a page. The choice is kept in the session, so it
+    # carries over to the other pages.
+    import streamlit as st
+
+    value = st.toggle("Count unique stories", value=st.session_state.get('count_unique_stories', False), key=key,
+                      help="Count syndicated and rewritten copies of the same story once.")
+    st.session_state['count_unique_stories'] = value
+    return value
+
+
+register_ingest_hook('dedup.count_week', BackgroundHook('dedup', count_week))
@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+from itertools import islice
+
+# One row per article. Rows are generated lazily from the data store, one week at a time, and
+# written out in chunks. Streamed to a file (cli.py export), an export holds one week and one chunk
+# in memory; export_bytes, used by the pages, holds the whole file.
+EXPORT_COLUMNS = ['week', 'cluster', 'title', 'collection', 'url']
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+CHUNK_ROWS = 10000
+
+
+def cluster_rows(week, cluster, collections=None):
+    articles = cluster['articles']
+    if collections is not None:
+        articles = articles.select(collections)
+    for title, url, collection in zip(articles.titles, articles.urls, articles.collections):
+        yield (week, cluster['name'], title, collection, url)
+
+
+def week_rows(data, week, collections=None):
+    for cluster in data[week]:
+        yield from cluster_rows(week, cluster, collections)
+
+
+def weeks_between(data, start_week, end_week):
+    if start_week not in data or end_week not in data:
+        return []
+    return data.catalog.between(start_week, end_week)
+
+
+def range_rows(data, start_week, end_week, collections=None):
+    for week in weeks_between(data, start_week, end_week):
+        yield from week_rows(data, week, collections)
+
+
+def chunked(rows, chunk_rows=CHUNK_ROWS):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_csv(rows, chunk_rows=CHUNK_ROWS):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in chunked(rows, chunk_rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def iter_jsonl(rows, chunk_rows=CHUNK_ROWS):
+    for chunk in chunked(rows, chunk_rows):
+        yield ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n' for row in chunk).encode()
+
+
+def write_parquet(rows, f, chunk_rows=CHUNK_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(column, pa.string()) for column in EXPORT_COLUMNS])
+    with pq.ParquetWriter(f, schema) as writer:
+        for chunk in chunked(rows, chunk_rows):
+            writer.write_table(pa.Table.from_arrays([pa.array(column, pa.string()) for column in zip(*chunk)],
+                                                    schema=schema))
+
+
+def write_export(rows, f, fmt, chunk_rows=CHUNK_ROWS):
+    # f is a binary file object; CSV and JSONL are written chunk by chunk as rows are produced.
+    if fmt == 'parquet':
+        write_parquet(rows, f, chunk_rows)
+        return
+    chunks = iter_csv(rows, chunk_rows) if fmt == 'csv' else iter_jsonl(rows, chunk_rows)
+    for chunk in chunks:
+        f.write(chunk)
+
+
+def export_bytes(rows, fmt):
+    buffer = io.BytesIO()
+    write_export(rows, buffer, fmt)
+    return buffer.getvalue()
+
+
+def export_controls(key, scope, file_stem, make_rows):
+    # Download widget for the pages. Nothing is generated on a rerun until "Prepare download" is
+    # clicked; the prepared file is then kept in the session until it is downloaded or the scope or
+    # format changes.
+    import streamlit as st
+
+    fmt = st.selectbox("Format:", list(FORMATS), key=f'{key}_format')
+    prepared_key = f'{key}_prepared'
+    prepared = st.session_state.get(prepared_key)
+    if prepared is None or prepared[0] != (scope, fmt):
+        st.session_state.pop(prepared_key, None)
+        if not st.button("Prepare download", key=f'{key}_prepare'):
+            return
+        prepared = ((scope, fmt), export_bytes(make_rows(), fmt))
+        st.session_state[prepared_key] = prepared
+
+    mime, extension = FORMATS[fmt]
+    st.download_button(
+        label=f"Download Data as {fmt.upper()}",
+        data=prepared[1],
+        file_name=f"{file_stem}.{extension}",
+        mime=mime,
+        key=f'{key}_download',
+        on_click=st.session_state.pop,
+        args=(prepared_key, None)
+    )
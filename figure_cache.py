@@ -0,0 +1,78 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import plotly.graph_objects as go
+
+from data_store import register_week_cache
+from perf import span
+
+MAX_FIGURES = int(os.environ.get('MC_FIGURE_CACHE_ENTRIES', 512))
+
+
+class FigureCache:
+    # Serialized Plotly figures keyed by (page, week, collection, options), shared by all sessions.
+    # A hit rebuilds the figure from its JSON without Plotly's property validation, which is most
+    # of the cost of constructing a figure from scratch.
+
+    def __init__(self, max_entries=MAX_FIGURES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generations = {}
+
+    def get_or_build(self, page, week, collection, options, build):
+        key = (page, week, collection, options)
+        with self._lock:
+            spec = self._entries.get(key)
+            hit = key in self._entries
+            if hit:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+                generation = self._generations.get(week, 0)
+
+        if hit:
+            with span('figures'):
+                return None if spec is None else go.Figure(json.loads(spec), _validate=False)
+
+        with span('figures'):
+            fig = build()
+            spec = None if fig is None else fig.to_json()
+
+        with self._lock:
+            # Skip storing a figure built from data that was invalidated while it was being built.
+            if generation == self._generations.get(week, 0):
+                self._entries[key] = spec
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return fig
+
+    def invalidate(self, weeks):
+        weeks = set(weeks)
+        with self._lock:
+            for key in [key for key in self._entries if key[1] in weeks]:
+                del self._entries[key]
+            for week in weeks:
+                self._generations[week] = self._generations.get(week, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': sum(len(spec) for spec in self._entries.values() if spec is not None),
+            }
+
+
+figure_cache = register_week_cache('figure_cache', FigureCache)
@@ -1,12 +1,12 @@
 # from data.test_data import *
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-import nltk
-import pandas as pd
+import functools
+import json
+import numpy as np
 import os
+import re
 
-nltk.download('stopwords')
-nltk.download('punkt_tab')
+from articles import ArticleList, StringTable, Summary
+from nlp_resources import get_stop_words, get_tokenizer
 
 group_colors = {
     "mostly left": "#4E79A7",
@@ -16,90 +16,178 @@ group_colors = {
     "mostly right": "#E15759"
 }
 
+# Collections are stored as small integer codes: a collection's position in group_colors.
+collections = list(group_colors.keys())
+collection_codes = {name: code for code, name in enumerate(collections)}
+# Articles from a collection that is not in group_colors have always been counted as "mostly right".
+fallback_collection_code = collection_codes["mostly right"]
+
+
+def encode_collections(names):
+    return np.array([collection_codes.get(name, fallback_collection_code) for name in names], dtype=np.int8)
+
+
+def count_collections(codes_per_cluster):
+    # One bincount over (cluster, collection) pairs gives the clusters x collections count matrix.
+    num_collections = len(collections)
+    if not codes_per_cluster:
+        return np.zeros((0, num_collections), dtype=np.int64)
+    cluster_index = np.repeat(np.arange(len(codes_per_cluster)), [len(codes) for codes in codes_per_cluster])
+    pairs = cluster_index * num_collections + np.concatenate(codes_per_cluster)
+    return np.bincount(pairs, minlength=len(codes_per_cluster) * num_collections).reshape(-1, num_collections)
+
+
+def week_collection_counts(clusters):
+    return np.array([cluster['collection_counts'] for cluster in clusters]).reshape(-1, len(collections))
+
+def filter_stopwords(sent):
+    stop_words = get_stop_words()
+
+    word_tokens = get_tokenizer()(sent)
+    return [w for w in word_tokens if not w.lower() in stop_words]
+
+
 def remove_stopwords(sent):
-    stop_words = set(stopwords.words('english'))
+    return ' '.join(filter_stopwords(sent))
 
-    word_tokens = word_tokenize(sent)
-    filtered_words = [w for w in word_tokens if not w.lower() in stop_words]
 
-    return ' '.join(filtered_words)
+# Same word pattern WordCloud uses when it tokenises raw text itself.
+term_pattern = re.compile(r"\w[\w']*")
 
 
+@functools.lru_cache(maxsize=2 ** 17)
+def title_terms(title):
+    # Memoised per unique title; the same headline often shows up in several weeks and clusters.
+    stop_words = get_stop_words()
+    terms = []
+    for token in filter_stopwords(title):
+        for word in term_pattern.findall(token):
+            if word.lower().endswith("'s"):
+                word = word[:-2]
+            if word and not word.isdigit() and word.lower() not in stop_words:
+                terms.append(word)
+    return tuple(terms)
 
-def get_data(data_path):
-    keys = [
-        'id',
-        'name',
-        'articles',
-        'mostly_left_summary',
-        'somewhat_left_summary',
-        'center_summary',
-        'somewhat_right_summary',
-        'mostly_right_summary'
-    ]
 
-    processed_clusters = {}
+def cluster_term_frequencies(cluster):
+    # Term counts of the cluster's titles per collection. The snapshot build stores them;
+    # for weeks read from JSONL they are computed on first use and kept on the cluster.
+    frequencies = cluster.get('term_frequencies')
+    if frequencies is None:
+        frequencies = {}
+        articles = cluster['articles']
+        for title, collection in zip(articles.titles, articles.collections):
+            counts = frequencies.setdefault(collection, {})
+            for term in title_terms(title):
+                counts[term] = counts.get(term, 0) + 1
+        cluster['term_frequencies'] = frequencies
+    return frequencies
+
+
+def merge_term_frequencies(frequency_maps):
+    # Case variants are merged under their most frequent spelling, as WordCloud does for raw text.
+    totals = {}
+    variants = {}
+    for frequencies in frequency_maps:
+        for term, count in frequencies.items():
+            key = term.lower()
+            totals[key] = totals.get(key, 0) + count
+            key_variants = variants.setdefault(key, {})
+            key_variants[term] = key_variants.get(term, 0) + count
+    return {max(variants[key], key=variants[key].get): total for key, total in totals.items()}
 
-    clusters = {}
 
-    base_path_to_all_data = data_path
-    json_files = [pos_json for pos_json in os.listdir(base_path_to_all_data) if pos_json.endswith('.jsonl')]
+def collection_term_frequencies(cluster, selected_collections):
+    frequencies = cluster_term_frequencies(cluster)
+    return merge_term_frequencies([frequencies[c] for c in selected_collections if c in frequencies])
+
+
+
+def week_name(file_name):
+    return file_name.replace('_', ' ').replace('.jsonl', '')
+
+
+def list_week_files(data_path):
+    json_files = [pos_json for pos_json in os.listdir(data_path) if pos_json.endswith('.jsonl')]
     json_files.sort()
+    return json_files
+
+
+CLUSTER_KEYS = [
+    'id',
+    'name',
+    'articles',
+    'mostly_left_summary',
+    'somewhat_left_summary',
+    'center_summary',
+    'somewhat_right_summary',
+    'mostly_right_summary'
+]
+SUMMARY_KEYS = [key for key in CLUSTER_KEYS if key.endswith('_summary')]
 
-    for file in json_files:
 
-        json_file = pd.read_json(path_or_buf=f'{base_path_to_all_data}/{file}', lines=True)
-        cur_cluster_name = file.replace('_', ' ').replace('.jsonl', '').replace(data_path, '')
-        clusters[cur_cluster_name] = []
-        len_cur_cluster = len(json_file['id'])
+def iter_week(path_or_buf):
+    # Streams cluster records one JSONL line at a time, so a consumer that stops early
+    # (process_week keeps the top 10) never parses the rest of the file.
+    if hasattr(path_or_buf, 'read'):
+        lines = path_or_buf
+    else:
+        lines = open(path_or_buf, 'rb')
 
+    try:
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield {key: record.get(key) for key in CLUSTER_KEYS}
+    finally:
+        if lines is not path_or_buf:
+            lines.close()
 
-        for idx in range(len_cur_cluster):
-            cur_item = {}
 
-            for key in keys:
-                cur_item[key] = json_file[key][idx]
+def process_week(week_clusters):
+    cluster_week = []
+    colors_list = ["#C8CFA0", "#FFDFBA", "#FFFFBA", "#BAFFC9", "#DBB5B5", "#D1C4E9", "#E8C5E5", "#D6DAC8", "#D7CCC8", "#DCEDC8"]
+    # colors_list = ["#4e79a7","#f28e2c","#e15759","#76b7b2","#59a14f","#edc949","#af7aa1","#ff9da7","#9c755f","#bab0ab"]
 
-            clusters[cur_cluster_name].append(cur_item)
+    # Titles and URLs repeat within a week (syndicated stories, summaries); each is stored once.
+    intern = StringTable()
 
+    for idx, c in enumerate(week_clusters):
+        c["color"] = colors_list[idx % 10]
+        c['article_counts'] = len(c['articles'])
 
-    for week in clusters:
+        # mostly_left, somewhat_left, center, somewhat_right, mostly_right
 
-        cluster_week = []
-        colors_list = ["#C8CFA0", "#FFDFBA", "#FFFFBA", "#BAFFC9", "#DBB5B5", "#D1C4E9", "#E8C5E5", "#D6DAC8", "#D7CCC8", "#DCEDC8"]
-        # colors_list = ["#4e79a7","#f28e2c","#e15759","#76b7b2","#59a14f","#edc949","#af7aa1","#ff9da7","#9c755f","#bab0ab"]
+        records = c['articles']
+        codes = encode_collections([article["collection"].replace("_", " ") for article in records])
+        c['articles'] = ArticleList([intern(article['title']) for article in records],
+                                    [intern(article['url']) for article in records], codes, collections)
+        c['collection_codes'] = codes
+        for key in SUMMARY_KEYS:
+            c[key] = Summary.from_record(c[key], intern)
 
-        for idx, c in enumerate(clusters[week]):
-            c["color"] = colors_list[idx % 10]
-            c['article_counts'] = len(c['articles'])
-            c["distribution"] = {}
-            c["distribution"]["mostly left"] = 0
-            c["distribution"]["somewhat left"] = 0
-            c["distribution"]["center"] = 0
-            c["distribution"]["somewhat right"] = 0
-            c["distribution"]["mostly right"] = 0
-            
-            # mostly_left, somewhat_left, center, somewhat_right, mostly_right
-            
-            for article in c["articles"]:
-                article["collection"] = article["collection"].replace("_", " ")
+        cluster_week.append(c)
 
-                if article["collection"] == "mostly left":
-                    c["distribution"]["mostly left"] += 1
-                elif article["collection"] == "somewhat left":
-                    c["distribution"]["somewhat left"] += 1
-                elif article["collection"] == "center":
-                    c["distribution"]["center"] += 1
-                elif article["collection"] == "somewhat right":
-                    c["distribution"]["somewhat right"] += 1
-                else:
-                    c["distribution"]["mostly right"] += 1
+        if idx >= 9:
+            break
 
-            cluster_week.append(c)
+    counts = count_collections([c['collection_codes'] for c in cluster_week])
+    for c, cluster_counts in zip(cluster_week, counts):
+        c['collection_counts'] = cluster_counts
+        c["distribution"] = dict(zip(collections, cluster_counts.tolist()))
 
-            if idx >= 9:
-                break
+    return cluster_week
+
+
+def load_week(path_or_buf):
+    return process_week(iter_week(path_or_buf))
+
+
+def get_data(data_path):
+    processed_clusters = {}
 
-        processed_clusters[week] = cluster_week
+    for file in list_week_files(data_path):
+        processed_clusters[week_name(file)] = load_week(f'{data_path}/{file}')
 
     return processed_clusters
@@ -1,18 +1,21 @@
 import streamlit as st
 import plotly.graph_objects as go
-import random
-import textwrap
-import plotly.express as px
-import pandas as pd
 import urllib.parse
 import sys
+import perf
+from profiling import profile_requested, profiled
 
-from helpers import get_data, group_colors
+from helpers import group_colors
+from data_store import get_shared_data
+from view_model import get_week_stories, get_week_view
+from dedup import count_unique_toggle
+from figure_cache import figure_cache
+import images  # prefetches thumbnails of every week the store loads
 
 st.set_page_config(layout="wide", initial_sidebar_state="collapsed")
 
 args = sys.argv[1:]
-data = get_data(args[0])
+data = get_shared_data(args[0])
 
 base_url = 'http://localhost:8501'
 
@@ -71,22 +74,6 @@ def display_individual_group_title(group, url_group):
     legend_html += "</div></div>"
     st.markdown(legend_html, unsafe_allow_html=True)
 
-def display_sample_articles(cluster_name, clusters, group=None):
-    cluster = next(c for c in clusters if c["name"] == cluster_name)
-    articles = cluster["articles"]
-    if group:
-        articles = [article for article in articles if article["collection"] == group]
-    sampled_articles = random.sample(articles, min(5, len(articles)))
-    articles_list = [f"- {article['title']}" for article in sampled_articles]
-    return "<br>".join(articles_list)
-
-
-def wrap_text(text, max_words=3):
-    words = text.split()
-    wrapped_text = '<br>'.join([' '.join(words[i:i + max_words]) for i in range(0, len(words), max_words)])
-    return wrapped_text
-
-
 
 def create_main_treemap(labels, values, colors, urls):
     fig = go.Figure(go.Treemap(
@@ -115,84 +102,15 @@ def treemap_callback(trace, points, selector):
 
 
 
-def create_cluster_group_treemap_hierarchical(clusters): # No longer used
-    labels = []
-    parents = []
-    values = []
-    texts = []
-    colors = []
-
-    for cluster in clusters:
-        cluster_name = cluster['name']
-        cluster_articles = cluster['article_counts']
-        labels.append(cluster_name)
-        parents.append("")
-        values.append(cluster_articles)
-        texts.append(f"Total Articles: {cluster_articles}")
-        colors.append(cluster['color'])
-
-        for group, count in cluster['distribution'].items():
-            labels.append(f"{group.title()}")
-            parents.append(cluster_name)
-            values.append(count)
-            colors.append(group_colors[group])
-            sample_articles = display_sample_articles(cluster_name, clusters, group)
-            texts.append(f"Sample articles: <br> {sample_articles}")
-
-    fig = go.Figure(go.Treemap(
-        labels=labels,
-        parents=parents,
-        values=values,
-        textinfo="label+value+text",
-        hoverinfo="label+value+text",
-        text=texts,
-        texttemplate="<b>%{label}</b><br>%{text}",
-        textposition="middle center",
-        marker=dict(colors=colors, showscale=False),
-        tiling=dict(packing="binary"),
-        textfont=dict(size=20)
-    ))
-
-    fig.update_traces(
-        hovertemplate='<b>%{label}</b><br>Number of Articles: %{value}<br>%{text}',
-        selector=dict(type='treemap'),
-        pathbar=dict(visible=True)
-    )
-
-    fig.update_layout(height=700)
-    fig.update_traces(marker=dict(cornerradius=10))
-    fig.update_layout(margin=dict(l=0, r=0, t=0, b=0))
-
-    return fig
-
-
-
-
-
-def create_group_treemap(group_name, clusters, total_articles, selected_week, colors):
-    group_articles = []
-    group_values = []
-    group_color_values = []
-    group_labels = []
-    group_full_labels = []
-    group_urls = []
-    group_sample_texts = []
-
-    for i, cluster in enumerate(clusters):
-        group_count = sum(1 for article in cluster['articles'] if article['collection'] == group_name)
+def create_group_treemap(group_name, week_view, counts, count_label="Number of Articles"):
+    collection_view = week_view.collections[group_name]
+    shown = [i for i, count in enumerate(counts) if count > 0]
 
-        if group_count > 0:
-            group_name_dashed = group_name.replace(' ', '_').strip()
-            cluster_group_headline = cluster[f'{group_name_dashed}_summary']['article']['title']
-
-
-            group_articles.append(group_count)
-            group_values.append(group_count)
-            group_color_values.append(((group_count / total_articles) * 100))
-            group_labels.append(wrap_text(cluster_group_headline))
-            group_full_labels.append(cluster_group_headline)
-            group_urls.append(f"/cluster_page?week={selected_week}&cluster={i}&collection={group_name}")
-            group_sample_texts.append(display_sample_articles(cluster['name'], clusters))
+    group_values = [counts[i] for i in shown]
+    group_labels = [collection_view.labels[i] for i in shown]
+    group_urls = [collection_view.urls[i] for i in shown]
+    group_sample_texts = [week_view.samples[i] for i in shown]
+    colors = week_view.colors
 
     if group_values:
         fig = go.Figure(go.Treemap(
@@ -210,7 +128,7 @@ def create_group_treemap(group_name, clusters, total_articles, selected_week, co
         ))
 
         fig.update_traces(
-            hovertemplate='<b>%{label}</b><br>Number of Articles: %{value}',
+            hovertemplate=f'<b>%{{label}}</b><br>{count_label}: %{{value}}',
             selector=dict(type='treemap'),
             pathbar=dict(visible=True)
         )
@@ -225,6 +143,21 @@ def create_group_treemap(group_name, clusters, total_articles, selected_week, co
 
 
 
+def create_week_treemap(week_view, values, count_label="Number of Articles"):
+    fig = create_main_treemap(week_view.labels, values, week_view.colors, week_view.urls)
+
+    fig.update_traces(
+        hovertemplate=f'<b>%{{label}}</b><br>{count_label}: %{{value}}',
+        selector=dict(type='treemap'),
+        pathbar=dict(visible=True)
+    )
+    fig.update_layout(height=700)
+    fig.update_traces(marker=dict(cornerradius=10))
+    fig.update_layout(margin=dict(l=0, r=0, t=0, b=0))
+
+    return fig
+
+
 def create_home_page():
     st.title("Media Cloud Election Dashboard")
     redirect_url = "/dev_view"
@@ -238,29 +171,19 @@ def create_home_page():
     redirect_url = f"/dev_view?week={selected_week}"
 
 
-    clusters = data[selected_week]
+    count_unique = count_unique_toggle("home_count_unique")
 
-    total_articles = sum(cluster['article_counts'] for cluster in clusters)
-    values = [cluster['article_counts'] for cluster in clusters]
-    color_values = [((cluster['article_counts'] / total_articles) * 100) for cluster in clusters]
-    labels = [wrap_text(cluster['name']) for cluster in clusters]
-    actual_labels = [cluster['name'] for cluster in clusters]
-    full_labels = [cluster['name'] for cluster in clusters]
-    urls = [f"/cluster_page?week={selected_week}&cluster={i}" for i in range(len(clusters))]
-    sample_texts = [display_sample_articles(cluster['name'], clusters) for cluster in clusters]
-    colors = [cluster['color'] for cluster in clusters]
-
-    fig = create_main_treemap(labels, values, colors, urls)
-
-    fig.update_traces(
-        hovertemplate='<b>%{label}</b><br>Number of Articles: %{value}',
-        selector=dict(type='treemap'),
-        pathbar=dict(visible=True)
-    )
-    fig.update_layout(height=700)
-    fig.update_traces(marker=dict(cornerradius=10))
-    fig.update_layout(margin=dict(l=0, r=0, t=0, b=0))
+    week_view = get_week_view(data, selected_week)
+    if count_unique:
+        week_stories = get_week_stories(data, selected_week)
+        values, group_counts, count_label = week_stories.values, week_stories.counts, "Unique Stories"
+    else:
+        values = week_view.values
+        group_counts = {group: collection_view.counts for group, collection_view in week_view.collections.items()}
+        count_label = "Number of Articles"
 
+    fig = figure_cache.get_or_build('home', selected_week, None, ('main', count_unique),
+                                    lambda: create_week_treemap(week_view, values, count_label))
 
     st.plotly_chart(fig, use_container_width=True)
 
@@ -290,7 +213,9 @@ def create_home_page():
                     unsafe_allow_html=True
                 )
 
-                group_treemap = create_group_treemap(group, clusters, total_articles, selected_week, colors)
+                group_treemap = figure_cache.get_or_build('home', selected_week, group, ('group', count_unique),
+                                                          lambda: create_group_treemap(group, week_view, group_counts[group],
+                                                                                       count_label))
                 if group_treemap:
                     st.plotly_chart(group_treemap, use_container_width=True)
         else:
@@ -300,11 +225,15 @@ def create_home_page():
                     unsafe_allow_html=True
                 )
 
-                group_treemap = create_group_treemap(group, clusters, total_articles, selected_week, colors)
+                group_treemap = figure_cache.get_or_build('home', selected_week, group, ('group', count_unique),
+                                                          lambda: create_group_treemap(group, week_view, group_counts[group],
+                                                                                       count_label))
                 if group_treemap:
                     st.plotly_chart(group_treemap, use_container_width=True)
 
-create_home_page()
+profile_rerun = profile_requested(st.experimental_get_query_params())
+with perf.rerun('home'), profiled('home', profile_rerun):
+    create_home_page()
 
 add_floating_button_pageup()
 
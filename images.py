@@ -0,0 +1,228 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
+
+from blob_cache import BlobCache, default_cache_dir
+from data_store import register_ingest_hook
+from helpers import SUMMARY_KEYS
+from perf import span
+
+# Each download gets at most REQUEST_TIMEOUT seconds; a whole batch (one render of the Top Images
+# row) gets at most FETCH_DEADLINE seconds, after which unfinished images are shown as placeholders.
+REQUEST_TIMEOUT = float(os.environ.get('MC_IMAGE_REQUEST_TIMEOUT', 3.0))
+FETCH_DEADLINE = float(os.environ.get('MC_IMAGE_FETCH_DEADLINE', 5.0))
+FETCH_WORKERS = int(os.environ.get('MC_IMAGE_FETCH_WORKERS', 16))
+PREFETCH_WORKERS = int(os.environ.get('MC_IMAGE_PREFETCH_WORKERS', 4))
+# Downloads waiting for a prefetch worker. Images of a week read while the queue is full are not
+# prefetched; the cluster page downloads them when it shows them.
+PREFETCH_QUEUE_SIZE = int(os.environ.get('MC_IMAGE_PREFETCH_QUEUE', 500))
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+# Images are stored downscaled to fit the Top Images columns of the cluster page.
+THUMBNAIL_SIZE = (480, 320)
+THUMBNAIL_QUALITY = 80
+# A URL that failed is not retried for this long, so one dead host does not cost every render a timeout.
+FAILURE_TTL = 300
+
+_session = None
+_session_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='image-fetch')
+_prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='image-prefetch')
+
+# JPEG thumbnails keyed by a hash of their URL. Every thumbnail is written to disk when it is stored,
+# so the store survives restarts; the disk budget is enforced by evicting least recently used files.
+thumbnail_store = BlobCache(
+    os.environ.get('MC_THUMBNAIL_CACHE_DIR', default_cache_dir('thumbnails')),
+    memory_bytes=int(os.environ.get('MC_THUMBNAIL_MEMORY_BYTES', 16 * 1024 * 1024)),
+    disk_bytes=int(os.environ.get('MC_THUMBNAIL_DISK_BYTES', 256 * 1024 * 1024)),
+    suffix='.jpg',
+    write_through=True,
+)
+
+_failures = {}
+_failures_lock = threading.Lock()
+_in_flight = {}
+# Reentrant: cancelling a queued prefetch runs its done callback, which takes the lock, inline.
+_in_flight_lock = threading.RLock()
+_queued_prefetches = set()
+_placeholder = None
+
+
+def placeholder_image():
+    global _placeholder
+    if _placeholder is None:
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new('RGB', (320, 200), '#D3D3D3').save(buffer, format='PNG')
+        _placeholder = buffer.getvalue()
+    return _placeholder
+
+
+def get_session():
+    # requests is imported on the first download rather than when a page imports this module.
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.mount('http://', HTTPAdapter(pool_connections=FETCH_WORKERS, pool_maxsize=FETCH_WORKERS))
+            session.mount('https://', HTTPAdapter(pool_connections=FETCH_WORKERS, pool_maxsize=FETCH_WORKERS))
+            _session = session
+        return _session
+
+
+def url_key(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def download_image(url, timeout=REQUEST_TIMEOUT):
+    start = time.monotonic()
+    chunks = []
+    size = 0
+    with get_session().get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(64 * 1024):
+            size += len(chunk)
+            if size > MAX_IMAGE_BYTES:
+                raise IOError(f'{url} is larger than {MAX_IMAGE_BYTES} bytes')
+            if time.monotonic() - start > timeout:
+                raise IOError(f'{url} took longer than {timeout}s')
+            chunks.append(chunk)
+
+    return b''.join(chunks)
+
+
+def make_thumbnail(content):
+    from PIL import Image
+
+    image = Image.open(BytesIO(content))
+    image.draft('RGB', THUMBNAIL_SIZE)
+    image.thumbnail(THUMBNAIL_SIZE)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def download_thumbnail(url, timeout=REQUEST_TIMEOUT):
+    return make_thumbnail(download_image(url, timeout))
+
+
+def _recently_failed(url):
+    with _failures_lock:
+        failed_at = _failures.get(url)
+        if failed_at is not None and time.monotonic() - failed_at > FAILURE_TTL:
+            del _failures[url]
+            return False
+        return failed_at is not None
+
+
+def _finish_download(url, future):
+    # Runs when a download ends, even after the render that asked for it gave up waiting,
+    # so a slow image is still stored for the next render.
+    with _in_flight_lock:
+        if _in_flight.get(url) is future:
+            del _in_flight[url]
+    if future.cancelled():
+        return
+    try:
+        content = future.result()
+    except Exception:
+        with _failures_lock:
+            _failures[url] = time.monotonic()
+        return
+    thumbnail_store.set(url_key(url), content)
+
+
+def _prefetch_thumbnail(url, timeout):
+    with _in_flight_lock:
+        _queued_prefetches.discard(url)
+    return download_thumbnail(url, timeout)
+
+
+def _start_download(url, timeout, prefetch=False):
+    # The future of the download of url, started on the fetch pool, or on the prefetch pool if
+    # prefetch is set; None if the prefetch queue is full.
+    with _in_flight_lock:
+        future = _in_flight.get(url)
+        if future is not None:
+            # A render does not wait behind the prefetch queue: a prefetch that has not started yet
+            # is cancelled and the image is downloaded on the fetch pool instead.
+            if prefetch or url not in _queued_prefetches or not future.cancel():
+                return future
+            _queued_prefetches.discard(url)
+        if prefetch:
+            if len(_queued_prefetches) >= PREFETCH_QUEUE_SIZE:
+                return None
+            _queued_prefetches.add(url)
+            future = _prefetch_executor.submit(_prefetch_thumbnail, url, timeout)
+        else:
+            future = _executor.submit(download_thumbnail, url, timeout)
+        _in_flight[url] = future
+    # Registered outside the lock: the callback takes it and runs inline if the future is already done.
+    future.add_done_callback(lambda done: _finish_download(url, done))
+    return future
+
+
+def fetch_images(urls, timeout=REQUEST_TIMEOUT, deadline=FETCH_DEADLINE):
+    # Serves thumbnails from the store and downloads the missing ones in parallel over the pooled
+    # session. Returns image bytes in the order of urls, with a placeholder for every url that is
+    # missing, failed or missed the deadline.
+    with span('images'):
+        return _fetch_images(urls, timeout, deadline)
+
+
+def _fetch_images(urls, timeout, deadline):
+    found = {}
+    pending = {}
+
+    for url in urls:
+        if not url or url in found or url in pending or _recently_failed(url):
+            continue
+        cached = thumbnail_store.get(url_key(url))
+        if cached is not None:
+            found[url] = cached
+        else:
+            pending[url] = _start_download(url, timeout)
+
+    if pending:
+        wait(pending.values(), timeout=deadline)
+
+    for url, future in pending.items():
+        if future.done() and future.exception() is None:
+            found[url] = future.result()
+
+    return [found.get(url) or placeholder_image() for url in urls]
+
+
+def week_image_urls(clusters):
+    urls = []
+    for cluster in clusters:
+        for key in SUMMARY_KEYS:
+            summary = cluster.get(key)
+            if summary is not None and summary.get('image_url'):
+                urls.append(summary.get('image_url'))
+    return list(dict.fromkeys(urls))
+
+
+def prefetch_week(week, clusters):
+    # Queues every summary image of a freshly loaded week on the prefetch pool, so the first view
+    # of its clusters is served from the thumbnail store instead of waiting on the network.
+    for url in week_image_urls(clusters):
+        if url_key(url) not in thumbnail_store and not _recently_failed(url):
+            if _start_download(url, REQUEST_TIMEOUT, prefetch=True) is None:
+                return
+
+
+register_ingest_hook('images.prefetch_week', prefetch_week)
@@ -0,0 +1,162 @@
+import math
+import os
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from data_store import WeekIndex, register_week_index
+from helpers import term_pattern
+from nlp_resources import get_stop_words
+
+# Links each cluster to the clusters of other weeks that cover the same story. A cluster is
+# described by the set of its most distinctive title terms and summarised by a MinHash signature;
+# the signatures are split into bands and every band is hashed into an LSH bucket, so the clusters
+# compared with a given one are only those sharing a bucket, never the whole archive. Adding a week
+# (in the background, as the store reads it) signs and buckets that week's clusters only.
+NUM_PERMUTATIONS = 64
+BAND_ROWS = 2
+SIGNATURE_TERMS = 32
+# Distinct titles read per cluster; term shares are stable well before this on large clusters.
+MAX_TITLES = 500
+# Estimated Jaccard similarity of two term sets above which clusters are linked.
+MIN_SIMILARITY = float(os.environ.get('MC_LINEAGE_MIN_SIMILARITY', 0.25))
+# Weeks searched on each side of a cluster for the lineage strip of the cluster page.
+LINEAGE_WEEKS = int(os.environ.get('MC_LINEAGE_WEEKS', 4))
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240708)
+_hash_a = _rng.integers(1, _PRIME, NUM_PERMUTATIONS, dtype=np.int64)
+_hash_b = _rng.integers(0, _PRIME, NUM_PERMUTATIONS, dtype=np.int64)
+
+
+def title_term_shares(cluster):
+    # Share of the cluster's distinct titles that contain each lowercase term.
+    stop_words = get_stop_words()
+    titles = list(dict.fromkeys(cluster['articles'].titles))[:MAX_TITLES]
+    counts = Counter()
+    for title in titles:
+        words = set()
+        for word in term_pattern.findall(title.lower()):
+            if word.endswith("'s"):
+                word = word[:-2]
+            if word and not word.isdigit() and word not in stop_words:
+                words.add(word)
+        counts.update(words)
+    return {term: count / len(titles) for term, count in counts.items()}
+
+
+def week_cluster_terms(clusters, limit=SIGNATURE_TERMS):
+    # The terms that best tell each cluster apart from the rest of its week (tf-idf over the week's
+    # clusters), so that names in every headline of the week do not link unrelated stories.
+    shares = [title_term_shares(cluster) for cluster in clusters]
+    document_counts = Counter(term for cluster_shares in shares for term in cluster_shares)
+    idf = {term: math.log((1 + len(clusters)) / (1 + count)) + 1 for term, count in document_counts.items()}
+    return [sorted(cluster_shares, key=lambda term: -cluster_shares[term] * idf[term])[:limit]
+            for cluster_shares in shares]
+
+
+def minhash(terms):
+    if not terms:
+        return None
+    values = np.array([zlib.crc32(term.encode()) & 0x7fffffff for term in terms], dtype=np.int64)
+    return ((_hash_a[:, None] * values[None, :] + _hash_b[:, None]) % _PRIME).min(axis=1)
+
+
+def similarity(signature, other):
+    return float(np.count_nonzero(signature == other)) / NUM_PERMUTATIONS
+
+
+def band_keys(signature):
+    rows = signature.reshape(-1, BAND_ROWS)
+    return [(band, row.tobytes()) for band, row in enumerate(rows)]
+
+
+class LineageIndex(WeekIndex):
+
+    def __init__(self):
+        super().__init__()
+        # week -> [(cluster name, signature or None)] in the week's cluster order
+        self._signatures = {}
+        # (band, band bytes) -> {(week, cluster index)}
+        self._buckets = {}
+
+    def build(self, week, clusters):
+        return [(cluster['name'], minhash(terms)) for cluster, terms in zip(clusters, week_cluster_terms(clusters))]
+
+    def store(self, week, signed):
+        self._signatures[week] = signed
+        for index, (_, signature) in enumerate(signed):
+            if signature is None:
+                continue
+            for key in band_keys(signature):
+                self._buckets.setdefault(key, set()).add((week, index))
+
+    def drop(self, week):
+        for index, (_, signature) in enumerate(self._signatures.pop(week)):
+            if signature is None:
+                continue
+            for key in band_keys(signature):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard((week, index))
+                    if not bucket:
+                        del self._buckets[key]
+
+    def links(self, week, index, weeks=None):
+        # [(week, cluster index, cluster name, similarity)] of the clusters of other weeks (or of
+        # weeks, if given) similar to cluster index of week, most similar first.
+        with self._lock:
+            signed = self._signatures.get(week)
+            if signed is None or index >= len(signed) or signed[index][1] is None:
+                return []
+            signature = signed[index][1]
+            candidates = set()
+            for key in band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+            allowed = None if weeks is None else set(weeks)
+            result = []
+            for other_week, other_index in candidates:
+                if other_week == week or (allowed is not None and other_week not in allowed):
+                    continue
+                name, other = self._signatures[other_week][other_index]
+                score = similarity(signature, other)
+                if score >= MIN_SIMILARITY:
+                    result.append((other_week, other_index, name, score))
+        return sorted(result, key=lambda link: -link[3])
+
+    def chain(self, week, index, weeks):
+        # Predecessors and successors of a cluster within weeks (in date order): each step moves to
+        # the linked cluster in the nearest week, the most similar one if there are several, and
+        # continues from there.
+        positions = {linked_week: i for i, linked_week in enumerate(weeks)}
+
+        def follow(step):
+            current_week, current_index = week, index
+            path = []
+            while True:
+                position = positions[current_week]
+                links = [link for link in self.links(current_week, current_index, weeks)
+                         if (positions[link[0]] - position) * step > 0]
+                if not links:
+                    return path
+                nearest = max(links, key=lambda link: (-abs(positions[link[0]] - position), link[3]))
+                path.append(nearest)
+                current_week, current_index = nearest[0], nearest[1]
+
+        return list(reversed(follow(-1))), follow(1)
+
+
+def get_lineage(data, week, index, num_weeks=LINEAGE_WEEKS):
+    # (predecessors, successors, unindexed weeks) of a cluster within num_weeks on either side of
+    # its week. Only the cluster's own week is signed here; neighbouring weeks are linked once the
+    # store has read them and the background hook has signed them, never faulted in for the strip.
+    catalog = data.catalog
+    position = catalog.positions[week]
+    weeks = catalog.weeks[max(0, position - num_weeks):position + num_weeks + 1]
+    lineage_index.ensure_weeks(data, [week])
+    indexed = lineage_index.indexed_weeks(weeks)
+    return (*lineage_index.chain(week, index, indexed), [other for other in weeks if other not in indexed])
+
+
+lineage_index = register_week_index('lineage', LineageIndex, background=True)
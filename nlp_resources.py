@@ -0,0 +1,99 @@
+import functools
+import os
+import re
+import warnings
+
+# NLTK data is never downloaded while the dashboard runs. It is fetched once into NLTK_DATA_DIR
+# (`python cli.py nltk-data`, also run by the Docker build) and resolved from there, together with
+# NLTK's usual search path, the first time it is needed in a process.
+NLTK_DATA_DIR = os.environ.get('MC_NLTK_DATA', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data'))
+NLTK_PACKAGES = ('stopwords', 'punkt_tab')
+
+# NLTK's English stopword list, used when the stopwords corpus is not installed.
+BUNDLED_STOP_WORDS = frozenset('''
+i me my myself we our ours ourselves you you're you've you'll you'd your yours yourself yourselves
+he him his himself she she's her hers herself it it's its itself they them their theirs themselves
+what which who whom this that that'll these those am is are was were be been being have has had
+having do does did doing a an the and but if or because as until while of at by for with about
+against between into through during before after above below to from up down in out on off over
+under again further then once here there when where why how all any both each few more most other
+some such no nor not only own same so than too very s t can will just don don't should should've
+now d ll m o re ve y ain aren aren't couldn couldn't didn didn't doesn doesn't hadn hadn't hasn
+hasn't haven haven't isn isn't ma mightn mightn't mustn mustn't needn needn't shan shan't shouldn
+shouldn't wasn wasn't weren weren't won won't wouldn wouldn't
+'''.split())
+
+# Fallback tokenizer: splits clitics ("do|n't", "Trump|'s") and punctuation the way the Treebank
+# tokenizer behind word_tokenize does for headline text.
+fallback_token_pattern = re.compile(r"\w+(?=n't\b)|n't\b|'\w+|\w+(?:[-.]\w+)*|[^\w\s]+")
+
+
+def download(target_dir=NLTK_DATA_DIR):
+    import nltk
+
+    for package in NLTK_PACKAGES:
+        if not nltk.download(package, download_dir=target_dir, quiet=True, raise_on_error=True):
+            raise RuntimeError(f'Could not download NLTK package {package!r}')
+
+
+@functools.lru_cache(maxsize=None)
+def _nltk_data():
+    try:
+        import nltk.data
+    except ImportError:
+        return None
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_DIR)
+    return nltk.data
+
+
+def _has_resource(resource):
+    nltk_data = _nltk_data()
+    if nltk_data is None:
+        return False
+    try:
+        nltk_data.find(resource)
+    except (LookupError, OSError):
+        # Older NLTK releases rewrite punkt paths and raise OSError for a punkt_tab they cannot read.
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def get_stop_words():
+    if _has_resource('corpora/stopwords'):
+        from nltk.corpus import stopwords
+
+        try:
+            return frozenset(stopwords.words('english'))
+        except (LookupError, OSError):
+            pass
+    warnings.warn(f'NLTK stopwords not found (looked in {NLTK_DATA_DIR}); using the bundled list.')
+    return BUNDLED_STOP_WORDS
+
+
+def regex_tokenize(text):
+    return fallback_token_pattern.findall(text)
+
+
+@functools.lru_cache(maxsize=None)
+def get_tokenizer():
+    if _has_resource('tokenizers/punkt_tab/english/'):
+        from nltk.tokenize import word_tokenize
+
+        try:
+            word_tokenize('Resources resolved.')
+            return word_tokenize
+        except (LookupError, OSError, ValueError):
+            pass
+    warnings.warn(f'NLTK punkt_tab not found (looked in {NLTK_DATA_DIR}); using the regex tokenizer.')
+    return regex_tokenize
+
+
+def check_resources():
+    # Resolves both resources once per process and reports where they came from.
+    return {
+        'stopwords': 'nltk' if get_stop_words() is not BUNDLED_STOP_WORDS else 'bundled',
+        'tokenizer': 'punkt' if get_tokenizer() is not regex_tokenize else 'regex',
+        'nltk_data_dir': NLTK_DATA_DIR,
+    }
@@ -1,17 +1,20 @@
 import streamlit as st
-import plotly.express as px
-from PIL import Image
-import requests
-from io import BytesIO
-from helpers import get_data, group_colors, remove_stopwords
-import pandas as pd
+from helpers import collection_term_frequencies, group_colors
+from data_store import get_shared_data, week_cached
+from view_model import get_week_view
+from figure_cache import figure_cache
+from word_clouds import get_word_cloud_png
+from images import fetch_images
+from export import cluster_rows, export_controls
+from lineage import get_lineage
+from dedup import unique_story_count
 import plotly.graph_objects as go
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud
 import sys
+import perf
+from profiling import profile_requested, profiled
 
 args = sys.argv[1:]
-data = get_data(args[0])
+data = get_shared_data(args[0])
 
 st.set_page_config(layout="wide", initial_sidebar_state="collapsed")
 
@@ -20,13 +23,16 @@ main_body_logo = 'assets/mediacloud-logo-black-2x.png'
 st.logo(sidebar_logo, icon_image=main_body_logo)
 
 def get_cluster_data(cluster_name, selected_week):
-    for cluster in data[selected_week]:
-        if cluster['name'] == cluster_name:
-            return cluster
-    return None
+    index = get_week_view(data, selected_week).index_by_name.get(cluster_name)
+    return None if index is None else data[selected_week][index]
 
-@st.cache_data
-def create_pie_chart(cluster, selected_groups):
+def create_pie_chart(selected_week, cluster_name, selected_groups):
+    return figure_cache.get_or_build('cluster_page', selected_week, selected_groups, ('pie', cluster_name),
+                                     lambda: build_pie_chart(selected_week, cluster_name, selected_groups))
+
+
+def build_pie_chart(selected_week, cluster_name, selected_groups):
+    cluster = get_cluster_data(cluster_name, selected_week)
     all_groups = list(group_colors.keys())
     if len(selected_groups) == len(cluster["distribution"]):
         filtered_distribution = cluster["distribution"]
@@ -52,35 +58,24 @@ def create_pie_chart(cluster, selected_groups):
 
     return fig
 
-@st.cache_data
-def display_sample_articles(cluster, selected_groups):
-    filtered_articles = [article for article in cluster["articles"] if article["collection"] in selected_groups]
+@week_cached
+def display_sample_articles(selected_week, cluster_name, selected_groups):
+    cluster = get_cluster_data(cluster_name, selected_week)
+    filtered_articles = cluster["articles"].select(selected_groups)
     sampled_articles = filtered_articles[:5]  # Sample 5 articles
     articles_list = [f"- [{article['title']}]({article['url']}) | {article['collection'].title()}" for article in
                      sampled_articles]
     return articles_list
 
 
-@st.cache_data
-def fetch_image(url):
-    return Image.open(BytesIO(requests.get(url).content))
-
-
 def display_sample_images(cluster, selected_groups):
-    if "Other" in selected_groups:
-        filtered_articles = [article for article in cluster["articles"] if article["collection"] not in selected_groups]
-    else:
-        filtered_articles = [article for article in cluster["articles"] if article["collection"] in selected_groups]
-    sampled_articles = filtered_articles[:5]
-    # images_list = [article['url'] for article in sampled_articles]
-
     images_list = []
     for group in selected_groups:
         group_name_dashed = group.replace(' ', '_').strip()
         img_url = cluster[f'{group_name_dashed}_summary']['image_url']
         images_list.append(img_url)
 
-    images = [fetch_image(url) for url in images_list]
+    images = fetch_images(images_list)
 
     return images
 
@@ -92,40 +87,43 @@ def calculate_total_and_percentage(cluster, selected_groups, selected_week):
     percentage = (selected_articles_count / total_articles) * 100
     return selected_articles_count, percentage
 
-@st.cache_data
-def generate_word_cloud(text):
-    wordcloud = WordCloud(width=800, height=400, background_color='white', colormap='gray', prefer_horizontal=1.0).generate(text)
-    fig, ax = plt.subplots(figsize=(10, 5))
-    ax.imshow(wordcloud, interpolation='bilinear')
-    ax.axis('off')
-    return fig
-
+def word_cloud_png(selected_week, cluster_name, selected_groups):
+    cluster = get_cluster_data(cluster_name, selected_week)
+    with perf.span('word cloud'):
+        return get_word_cloud_png(collection_term_frequencies(cluster, selected_groups))
 
 
 
-def download_cluster_data_as_csv(cluster, week, selected_groups, is_duplicate=False):
-    articles_data = []
-    for article in cluster["articles"]:
-        if article["collection"] in selected_groups:
-            articles_data.append({
-                "Title": article["title"],
-                "collection": article["collection"],
-                "URL": article["url"]
-            })
-    df = pd.DataFrame(articles_data)
-    csv = df.to_csv(index=False)
 
+def download_cluster_data(cluster, week, selected_groups, is_duplicate=False):
     if is_duplicate:
-        file_name = f"{cluster['name']}_week_{week}_1.csv"
+        file_stem = f"{cluster['name']}_week_{week}_1"
     else:
-        file_name = f"{cluster['name']}_week_{week}.csv"
+        file_stem = f"{cluster['name']}_week_{week}"
 
-    st.download_button(
-        label="Download Data as CSV",
-        data=csv,
-        file_name=file_name,
-        mime="text/csv"
-    )
+    collections = tuple(selected_groups)
+    export_controls(f"export_{file_stem}", (week, cluster['name'], collections), file_stem,
+                    lambda: cluster_rows(week, cluster, set(collections)))
+
+
+def display_lineage(selected_week, cluster_index):
+    predecessors, successors, unindexed = get_lineage(data, selected_week, cluster_index)
+    if unindexed:
+        st.caption(f"{len(unindexed)} of the surrounding weeks have not been read yet; "
+                   f"their clusters are linked here once they have been.")
+    if not predecessors and not successors:
+        st.caption("No related clusters found in the surrounding weeks.")
+        return
+    current = (selected_week, cluster_index, data[selected_week][cluster_index]['name'], None)
+    strip = predecessors + [current] + successors
+    for col, (week, index, name, score) in zip(st.columns(len(strip)), strip):
+        col.caption(week)
+        if score is None:
+            col.markdown(f"**{name}**")
+        else:
+            week_id = week.replace(' ', "%20")
+            col.markdown(f"[{name}](/cluster_page?week={week_id}&cluster={index})")
+            col.caption(f"{score:.0%} similar")
 
 
 def add_placeholder(): # This adds an empty block. I use this to align both columns.
@@ -185,6 +183,8 @@ def create_cluster_page():
         unsafe_allow_html=True
     )
 
+    lineage_container = st.container()
+
     col1, col2 = st.columns(2)
 
     with col1:
@@ -198,6 +198,10 @@ def create_cluster_page():
         selected_cluster_name = st.selectbox("Change first set:", cluster_names, index=cluster_index)
         main_cluster = get_cluster_data(selected_cluster_name, selected_week)
 
+        with lineage_container:
+            st.markdown("### Story Lineage")
+            display_lineage(selected_week, cluster_names.index(selected_cluster_name))
+
         group_options = list(main_cluster["distribution"].keys())
         initial_options = group_options
 
@@ -218,14 +222,15 @@ def create_cluster_page():
 
         st.markdown("---")
 
-        download_cluster_data_as_csv(main_cluster, selected_week, selected_groups)
+        download_cluster_data(main_cluster, selected_week, selected_groups)
 
         total_articles, percentage = calculate_total_and_percentage(main_cluster, selected_groups, selected_week)
         st.markdown(f"**Percentage:** {percentage:.2f}%")
         st.markdown(f"**Number of Articles:** {total_articles}")
+        st.markdown(f"**Unique Stories:** {unique_story_count(main_cluster, selected_groups)}")
 
         pie_chart_placeholder = st.empty()
-        pie_chart = create_pie_chart(main_cluster, selected_groups)
+        pie_chart = create_pie_chart(selected_week, main_cluster['name'], tuple(selected_groups))
         pie_chart_placeholder.plotly_chart(pie_chart, use_container_width=True)
 
         sample_images = display_sample_images(main_cluster, selected_groups)
@@ -235,12 +240,10 @@ def create_cluster_page():
             col.image(img, use_column_width=True)
 
         st.markdown("### Top Terms from Headlines")
-        cluster_text = " ".join(
-            [remove_stopwords(article["title"]) for article in main_cluster["articles"] if article['collection'] in selected_groups])
         wordcloud_placeholder = st.empty()
-        wordcloud_placeholder.pyplot(generate_word_cloud(cluster_text))
+        wordcloud_placeholder.image(word_cloud_png(selected_week, main_cluster['name'], selected_groups), use_column_width=True)
 
-        sample_articles = display_sample_articles(main_cluster, selected_groups)
+        sample_articles = display_sample_articles(selected_week, main_cluster['name'], tuple(selected_groups))
         st.markdown("### Sample Articles")
         st.markdown("\n".join(sample_articles))
 
@@ -268,7 +271,14 @@ def create_cluster_page():
 
         total_articles, percentage = calculate_total_and_percentage(other_cluster, selected_other_groups, selected_week)
 
-        show_comparison = st.button("Compare")
+        # Remembered for the pair of clusters, so the second set stays open when its download is
+        # prepared and closes when either cluster changes.
+        compared_pair = (selected_week, selected_cluster_name, selected_other_cluster_name)
+        if st.session_state.get("show_comparison") == compared_pair:
+            st.button("Close comparison", on_click=st.session_state.pop, args=("show_comparison", None))
+        else:
+            st.button("Compare", on_click=st.session_state.__setitem__, args=("show_comparison", compared_pair))
+        show_comparison = st.session_state.get("show_comparison") == compared_pair
 
         if show_comparison:
             if "Other" in selected_other_groups:
@@ -279,15 +289,16 @@ def create_cluster_page():
             st.markdown("---")
 
             if other_cluster == main_cluster:
-                download_cluster_data_as_csv(other_cluster, selected_week, selected_other_groups, is_duplicate=True)
+                download_cluster_data(other_cluster, selected_week, selected_other_groups, is_duplicate=True)
             else:
-                download_cluster_data_as_csv(other_cluster, selected_week, selected_other_groups)
+                download_cluster_data(other_cluster, selected_week, selected_other_groups)
 
             st.markdown(f"**Percentage:** {percentage:.2f}%")
             st.markdown(f"**Number of Articles:** {total_articles}")
+            st.markdown(f"**Unique Stories:** {unique_story_count(other_cluster, selected_other_groups)}")
 
             other_pie_chart_placeholder = st.empty()
-            other_pie_chart = create_pie_chart(other_cluster, selected_other_groups)
+            other_pie_chart = create_pie_chart(selected_week, other_cluster['name'], tuple(selected_other_groups))
             other_pie_chart_placeholder.plotly_chart(other_pie_chart, use_container_width=True)
 
             other_sample_images = display_sample_images(other_cluster, selected_other_groups)
@@ -297,13 +308,13 @@ def create_cluster_page():
                 col.image(img, use_column_width=True)
 
             st.markdown("### Top Terms from Headlines")
-            cluster_text = " ".join(
-                [remove_stopwords(article["title"]) for article in other_cluster["articles"] if article['collection'] in selected_other_groups])
             wordcloud_placeholder = st.empty()
-            wordcloud_placeholder.pyplot(generate_word_cloud(cluster_text))
+            wordcloud_placeholder.image(word_cloud_png(selected_week, other_cluster['name'], selected_other_groups), use_column_width=True)
 
-            other_sample_articles = display_sample_articles(other_cluster, selected_other_groups)
+            other_sample_articles = display_sample_articles(selected_week, other_cluster['name'], tuple(selected_other_groups))
             st.markdown("### Sample Articles")
             st.markdown("\n".join(other_sample_articles))
 
-create_cluster_page()
+profile_rerun = profile_requested(st.experimental_get_query_params())
+with perf.rerun('cluster_page'), profiled('cluster_page', profile_rerun):
+    create_cluster_page()
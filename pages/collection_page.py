@@ -1,44 +1,34 @@
 import streamlit as st
-import plotly.express as px
 import plotly.graph_objects as go
 import random
-from helpers import get_data, group_colors
+from helpers import group_colors
+from data_store import get_shared_data
+from view_model import get_week_stories, get_week_view
+from attention import get_week_rollups
+from dedup import count_unique_toggle
+from figure_cache import figure_cache
+from export import export_controls, range_rows
+import images  # prefetches thumbnails of every week the store loads
 import sys
+import os
+import perf
+from profiling import profile_requested, profiled
 
 args = sys.argv[1:]
-data = get_data(args[0])
+data = get_shared_data(args[0])
 
 st.set_page_config(layout="wide", initial_sidebar_state="collapsed")
 
+# Weeks of history shown at a time; only the weeks on the current page get a treemap.
+HISTORY_PAGE_SIZE = int(os.environ.get('MC_HISTORY_PAGE_SIZE', 5))
+
 sidebar_logo = 'assets/mediacloud-logo-black-2x.png'
 main_body_logo = 'assets/mediacloud-logo-black-2x.png'
 st.logo(sidebar_logo, icon_image=main_body_logo)
 
-def get_cluster_data(cluster_name, selected_week):
-    for cluster in data[selected_week]:
-        if cluster['name'] == cluster_name:
-            return cluster
-    return None
-
-
-def wrap_text(text, max_words=3):
-    words = text.split()
-    wrapped_text = '<br>'.join([' '.join(words[i:i + max_words]) for i in range(0, len(words), max_words)])
-    return wrapped_text
-
-def print_sample_articles(group_name, clusters, num_samples=5):
+def print_sample_articles(group_name, week_view, num_samples=5):
     random.seed(random.randint(1, 100))
-    articles_list = []
-
-    for cluster in clusters:
-        num_articles = len(cluster['articles'])
-        count_articles = 0
-        for i in range(num_articles):
-            if cluster['articles'][i]['collection'] == group_name:
-                articles_list.append(cluster['articles'][i])
-                count_articles = count_articles + 1
-            if count_articles >= 5:
-                break
+    articles_list = week_view.collections[group_name].sample_pool
 
     sampled_articles = random.sample(articles_list, min(num_samples, len(articles_list)))
 
@@ -46,23 +36,25 @@ def print_sample_articles(group_name, clusters, num_samples=5):
         st.markdown(f"- [{article['title']}]({article['url']})")
 
 
-def create_group_treemap(selected_week, group_name, clusters, is_duplicate=False):
-    labels = []
-    parents = []
-    values = []
-    colors = [cluster['color'] for cluster in clusters]
-    group_urls = []
+def create_group_treemap(selected_week, group_name, is_duplicate=False, count_unique=False):
+    return figure_cache.get_or_build('collection_page', selected_week, group_name,
+                                     ('treemap', is_duplicate, count_unique),
+                                     lambda: build_group_treemap(selected_week, group_name, is_duplicate, count_unique))
 
-    for i, cluster in enumerate(clusters):
-        for group, count in cluster['distribution'].items():
-            if group == group_name:
-                group_name_dashed = group_name.replace(' ', '_').strip()
-                cluster_group_headline = cluster[f'{group_name_dashed}_summary']['article']['title']
 
-                labels.append(wrap_text(cluster_group_headline))
-                parents.append("")
-                values.append(count)
-                group_urls.append(f"/cluster_page?week={selected_week}&cluster={i}&collection={group_name}")
+def build_group_treemap(selected_week, group_name, is_duplicate=False, count_unique=False):
+    week_view = get_week_view(data, selected_week)
+    collection_view = week_view.collections[group_name]
+    labels = collection_view.labels
+    parents = [""] * len(labels)
+    if count_unique:
+        values = get_week_stories(data, selected_week).counts[group_name]
+        count_label = "Unique Stories"
+    else:
+        values = collection_view.counts
+        count_label = "Articles"
+    colors = week_view.colors
+    group_urls = collection_view.urls
 
     if is_duplicate:
         fig = go.Figure(go.Treemap(
@@ -70,7 +62,7 @@ def create_group_treemap(selected_week, group_name, clusters, is_duplicate=False
             parents=parents,
             values=values,
             marker=dict(colors=colors, showscale=False, line=dict(color='black', width=0.5)),
-            hovertemplate='%{label}<br>Articles: %{value}<br>',
+            hovertemplate=f'%{{label}}<br>{count_label}: %{{value}}<br>',
             texttemplate="<b><a href='%{customdata}' style='text-decoration: underline;'>%{label}</a></b>",
             customdata=group_urls,
             textposition='middle center',
@@ -82,7 +74,7 @@ def create_group_treemap(selected_week, group_name, clusters, is_duplicate=False
             parents=parents,
             values=values,
             marker=dict(colors=colors, showscale=False, line=dict(color='black', width=0.5)),
-            hovertemplate='<b>%{label}</b><br>Articles: %{value}<br>',
+            hovertemplate=f'<b>%{{label}}</b><br>{count_label}: %{{value}}<br>',
             texttemplate="<b><a href='%{customdata}' style='text-decoration: underline;'>%{label}</a></b>",
             customdata=group_urls,
             textposition='middle center',
@@ -96,13 +88,22 @@ def create_group_treemap(selected_week, group_name, clusters, is_duplicate=False
     return fig
 
 
-def create_group_pie_chart(group_name, clusters):
-    # total_articles = sum(cluster['article_counts'] for cluster in clusters)
+def create_group_pie_chart(group_name, selected_week, count_unique=False):
+    return figure_cache.get_or_build('collection_page', selected_week, group_name, ('pie', count_unique),
+                                     lambda: build_group_pie_chart(group_name, selected_week, count_unique))
 
 
-    total_articles = clusters[0]['mostly_left_summary']['total_num_articles']
-    group_articles = sum(
-        count for cluster in clusters for group, count in cluster['distribution'].items() if group == group_name)
+def build_group_pie_chart(group_name, selected_week, count_unique=False):
+    # total_articles = sum(cluster['article_counts'] for cluster in clusters)
+
+    if count_unique:
+        # Stories of the top clusters this collection carried, against those it did not.
+        week_stories = get_week_stories(data, selected_week)
+        total_articles = week_stories.total
+        group_articles = sum(week_stories.counts[group_name])
+    else:
+        total_articles = data[selected_week][0]['mostly_left_summary']['total_num_articles']
+        group_articles = get_week_view(data, selected_week).collections[group_name].total
     other_articles = total_articles - group_articles
 
     colors = [group_colors[group_name], "#D3D3D3"]
@@ -120,13 +121,12 @@ def create_group_pie_chart(group_name, clusters):
 
 
 def update_treemap_piechart_curr_week(selected_week, group_name):
-    clusters = data[selected_week]
     st.markdown(f"### Overall attention during {selected_week}")
-    pie_chart = create_group_pie_chart(group_name, clusters)
+    pie_chart = create_group_pie_chart(group_name, selected_week)
     st.plotly_chart(pie_chart, use_container_width=True)
 
     st.markdown(f"### Treemap for this week")
-    group_treemap = create_group_treemap(selected_week, group_name, clusters)
+    group_treemap = create_group_treemap(selected_week, group_name)
     st.plotly_chart(group_treemap, use_container_width=True)
 
 
@@ -147,44 +147,65 @@ def create_collection_page():
 
     week_options = list(data.keys())
     selected_week = st.selectbox("Select a week:", week_options, index=week_options.index(initial_selected_week))
-
-    clusters = data[selected_week]
+    count_unique = count_unique_toggle("collection_count_unique")
 
     col1, col2 = st.columns(2)
 
     with col1:
         st.markdown(f"#### Overall attention for {selected_week}")
-        pie_chart = create_group_pie_chart(group_name, clusters)
+        pie_chart = create_group_pie_chart(group_name, selected_week, count_unique)
         st.plotly_chart(pie_chart, use_container_width=True)
 
 
     with col2:
         st.markdown(f"#### Top clusters for {selected_week}")
-        group_treemap = create_group_treemap(selected_week, group_name, clusters)
+        group_treemap = create_group_treemap(selected_week, group_name, count_unique=count_unique)
         st.plotly_chart(group_treemap, use_container_width=True)
 
 
     st.markdown(f"#### Sample articles for {selected_week}")
-    print_sample_articles(group_name, clusters, 5)
+    print_sample_articles(group_name, get_week_view(data, selected_week), 5)
+
+    with st.expander("Download articles"):
+        start_week, end_week = st.select_slider("Weeks:", options=week_options, value=(selected_week, selected_week))
+        if start_week == end_week:
+            file_stem = f"{group_name}_week_{start_week}"
+        else:
+            file_stem = f"{group_name}_weeks_{start_week.split(' to ')[0]}_to_{end_week.split(' to ')[-1]}"
+        export_controls("collection_export", (group_name, start_week, end_week), file_stem,
+                        lambda: range_rows(data, start_week, end_week, {group_name}))
 
     st.markdown(
         f"<h1>Historical Attention Over Clusters for All Weeks for <span style='color: {group_colors[group_name]};'>{group_name.title()}</span></h1>",
         unsafe_allow_html=True
     )
 
-    for week in reversed(list(data.keys())):
-        if week > selected_week:
-            continue
-
-        if week != selected_week:
-            st.markdown(f"#### {week.replace('%20', ' ').capitalize()}")
-            week_clusters = data[week]
-            week_group_treemap = create_group_treemap(week, group_name, week_clusters)
-            st.plotly_chart(week_group_treemap, use_container_width=True)
-        else:
-            st.markdown(f"#### {week.replace('%20', ' ').capitalize()} (Selected Week)")
-            week_clusters = data[week]
-            week_group_treemap = create_group_treemap(week, group_name, week_clusters, is_duplicate=True)
-            st.plotly_chart(week_group_treemap, use_container_width=True)
-
-create_collection_page()
+    group_id = group_name.replace(' ', "%20")
+    st.markdown(f"[Share of attention across all weeks](/trend_page?collection={group_id})")
+    display_history(group_name, selected_week, count_unique)
+
+
+def display_history(group_name, selected_week, count_unique=False):
+    history_weeks = list(reversed(data.catalog.up_to(selected_week)))
+    num_pages = max(1, -(-len(history_weeks) // HISTORY_PAGE_SIZE))
+    page = st.number_input(f"Page of history (1-{num_pages}):", min_value=1, max_value=num_pages, value=1,
+                           key=f"history_page_{group_name}_{selected_week}")
+    first = (page - 1) * HISTORY_PAGE_SIZE
+    shown_weeks = history_weeks[first:first + HISTORY_PAGE_SIZE]
+    st.caption(f"Showing weeks {first + 1}-{first + len(shown_weeks)} of {len(history_weeks)}")
+
+    for totals in get_week_rollups(data, shown_weeks):
+        week = totals.label
+        title = week.replace('%20', ' ').capitalize()
+        if week == selected_week:
+            title += " (Selected Week)"
+        st.markdown(f"#### {title}")
+        st.caption(f"{totals.articles[group_name]} articles in {totals.clusters[group_name]} of the top clusters "
+                   f"({totals.total_articles} articles in total)")
+        week_group_treemap = create_group_treemap(week, group_name, is_duplicate=week == selected_week,
+                                                  count_unique=count_unique)
+        st.plotly_chart(week_group_treemap, use_container_width=True)
+
+profile_rerun = profile_requested(st.experimental_get_query_params())
+with perf.rerun('collection_page'), profiled('collection_page', profile_rerun):
+    create_collection_page()
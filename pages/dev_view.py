@@ -1,12 +1,19 @@
 import streamlit as st
 import random
-from helpers import get_data
+import time
+from data_store import get_shared_data
 import sys
+import perf
+import profiling
+from profiling import profile_requested, profiled
+from figure_cache import figure_cache
+from word_clouds import png_cache
+from images import thumbnail_store
 
 st.set_page_config(layout="wide", initial_sidebar_state="collapsed")
 
 args = sys.argv[1:]
-clusters = get_data(args[0])
+clusters = get_shared_data(args[0])
 
 sidebar_logo = 'assets/mediacloud-logo-black-2x.png'
 main_body_logo = 'assets/mediacloud-logo-black-2x.png'
@@ -20,9 +27,57 @@ def sample_articles(articles, n=20):
 def get_articles_by_group(week_clusters, group):
     articles = []
     for cluster in week_clusters:
-        articles.extend([article for article in cluster['articles'] if article['collection'] == group])
+        articles.extend(cluster['articles'].select([group]))
     return articles
 
+def display_performance_panel():
+    st.header("Performance")
+    st.caption("Time per rerun and per stage, from the most recent reruns of every page in this process. "
+               "Stages can nest: data loads inside figure builds count towards both.")
+
+    percentiles = perf.page_percentiles()
+    rows = []
+    for page, stages in sorted(percentiles.items()):
+        for stage, (count, p50, p95) in sorted(stages.items(), key=lambda item: item[0] != 'total'):
+            rows.append({"page": page, "stage": stage, "reruns": count,
+                         "p50 (ms)": round(p50 * 1000, 1), "p95 (ms)": round(p95 * 1000, 1)})
+    st.subheader("p50 / p95 per page")
+    st.dataframe(rows, use_container_width=True)
+
+    st.subheader("Recent reruns")
+    recent = []
+    for rerun in perf.recent_reruns(50):
+        row = {"page": rerun['page'], "started": time.strftime('%H:%M:%S', time.localtime(rerun['started'])),
+               "total (ms)": round(rerun['total'] * 1000, 1)}
+        row.update({f"{stage} (ms)": round(seconds * 1000, 1) for stage, seconds in rerun['stages'].items()})
+        recent.append(row)
+    st.dataframe(recent, use_container_width=True)
+
+    st.subheader("Caches")
+    st.dataframe([
+        {"cache": "figures", **figure_cache.stats()},
+        {"cache": "word clouds", **png_cache.stats()},
+        {"cache": "thumbnails", **thumbnail_store.stats()},
+    ], use_container_width=True)
+
+
+def display_profiles():
+    st.header("Profiles")
+    st.caption(f"Open any page with ?profile=1 to profile that rerun. Profiles are saved in {profiling.PROFILE_DIR}.")
+
+    profile_names = profiling.list_profiles()
+    if not profile_names:
+        st.write("No profiles captured yet.")
+        return
+
+    selected_profile = st.selectbox("Choose a profile:", profile_names)
+    sort = st.radio("Sort by:", ["cumulative", "own time"], horizontal=True)
+    st.dataframe(profiling.top_functions(selected_profile, sort=sort if sort == "cumulative" else "tottime"),
+                 use_container_width=True)
+    with open(profiling.profile_path(selected_profile), 'rb') as f:
+        st.download_button("Download profile", f.read(), file_name=selected_profile)
+
+
 def create_dev_view():
     params = st.experimental_get_query_params()
 
@@ -70,4 +125,9 @@ def create_dev_view():
                     st.write(f"- [{article['title']}]({article['url']})")
 
 
-create_dev_view()
\ No newline at end of file
+profile_rerun = profile_requested(st.experimental_get_query_params())
+with perf.rerun('dev_view'), profiled('dev_view', profile_rerun):
+    create_dev_view()
+
+display_performance_panel()
+display_profiles()
@@ -0,0 +1,77 @@
+import streamlit as st
+from helpers import group_colors
+from data_store import get_shared_data
+from search import search
+import sys
+import os
+import time
+import perf
+from profiling import profile_requested, profiled
+
+args = sys.argv[1:]
+data = get_shared_data(args[0])
+
+st.set_page_config(layout="wide", initial_sidebar_state="collapsed")
+
+# Clusters listed per search; the count of all matching clusters is shown above them.
+MAX_SEARCH_RESULTS = int(os.environ.get('MC_MAX_SEARCH_RESULTS', 50))
+
+sidebar_logo = 'assets/mediacloud-logo-black-2x.png'
+main_body_logo = 'assets/mediacloud-logo-black-2x.png'
+st.logo(sidebar_logo, icon_image=main_body_logo)
+
+
+def display_result(result):
+    breakdown = ", ".join(
+        f"<span style='color: {group_colors[collection]};'>{collection.title()}</span> {count}"
+        for collection, count in result.collections.items()
+    )
+    st.markdown(f"- [{result.name}]({result.url}) | {result.week} | **{result.hits}** articles ({breakdown})",
+                unsafe_allow_html=True)
+
+
+def create_search_page():
+    query_params = st.experimental_get_query_params()
+
+    st.markdown("<h1>Search Headlines</h1>", unsafe_allow_html=True)
+
+    query = st.text_input("Search article titles:", value=query_params.get("q", [""])[0])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        group_options = list(group_colors.keys())
+        selected_groups = st.multiselect("Collections:", group_options, default=group_options)
+    with col2:
+        catalog = data.catalog
+        if catalog.starts:
+            first_day, last_day = catalog.starts[0], catalog.ends[-1]
+            date_range = st.date_input("Dates:", value=(first_day, last_day), min_value=first_day, max_value=last_day)
+        else:
+            date_range = ()
+
+    if not query.strip():
+        return
+
+    if len(date_range) == 2:
+        weeks = catalog.between_dates(*date_range)
+    elif len(date_range) == 1:
+        # Only the first day is picked while a range is being selected: search that day.
+        weeks = catalog.between_dates(date_range[0], date_range[0])
+    else:
+        weeks = list(data.keys())
+
+    with st.spinner("Indexing headlines..."):
+        started = time.perf_counter()
+        results = search(data, query, weeks, selected_groups)
+        elapsed = time.perf_counter() - started
+
+    st.caption(f"{len(results)} clusters in {len(weeks)} weeks ({elapsed * 1000:.0f} ms)")
+    if not results:
+        st.write("No headlines match all of the search terms.")
+        return
+    for result in results[:MAX_SEARCH_RESULTS]:
+        display_result(result)
+
+profile_rerun = profile_requested(st.experimental_get_query_params())
+with perf.rerun('search_page'), profiled('search_page', profile_rerun):
+    create_search_page()
@@ -0,0 +1,123 @@
+import streamlit as st
+import plotly.graph_objects as go
+from helpers import collections, group_colors
+from data_store import get_shared_data
+from attention import attention_matrix, get_attention, get_period_rollups, get_rollup, shares
+import sys
+import perf
+from profiling import profile_requested, profiled
+
+args = sys.argv[1:]
+data = get_shared_data(args[0])
+
+st.set_page_config(layout="wide", initial_sidebar_state="collapsed")
+
+sidebar_logo = 'assets/mediacloud-logo-black-2x.png'
+main_body_logo = 'assets/mediacloud-logo-black-2x.png'
+st.logo(sidebar_logo, icon_image=main_body_logo)
+
+
+def build_share_chart(weeks, week_shares):
+    fig = go.Figure()
+    for i, collection in enumerate(collections):
+        fig.add_trace(go.Scatter(
+            x=weeks,
+            y=week_shares[:, i] * 100,
+            name=collection.title(),
+            mode='lines',
+            stackgroup='share',
+            line=dict(width=0.5, color=group_colors[collection]),
+            hovertemplate=f'<b>{collection.title()}</b><br>%{{x}}<br>%{{y:.1f}}% of articles<extra></extra>'
+        ))
+    fig.update_layout(height=450, margin=dict(l=0, r=0, t=0, b=0), yaxis=dict(ticksuffix='%', range=[0, 100]),
+                      legend=dict(orientation='h', y=-0.2))
+    return fig
+
+
+def build_collection_chart(collection, weeks, week_counts, week_shares):
+    i = collections.index(collection)
+    top_clusters = [attention_matrix.top_cluster(week, collection) for week in weeks]
+    hover = [f"Top cluster: {name} ({count} articles)" if name else "" for name, count in top_clusters]
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=weeks,
+        y=week_counts[:, i],
+        name='Articles',
+        marker=dict(color=group_colors[collection]),
+        customdata=hover,
+        hovertemplate='<b>%{x}</b><br>Articles: %{y}<br>%{customdata}<extra></extra>'
+    ))
+    fig.add_trace(go.Scatter(
+        x=weeks,
+        y=week_shares[:, i] * 100,
+        name='Share of all articles',
+        yaxis='y2',
+        mode='lines+markers',
+        line=dict(color='black'),
+        hovertemplate='%{y:.1f}% of all articles<extra></extra>'
+    ))
+    fig.update_layout(height=400, margin=dict(l=0, r=0, t=0, b=0), legend=dict(orientation='h', y=-0.2),
+                      yaxis=dict(title='Articles'),
+                      yaxis2=dict(title='Share', overlaying='y', side='right', ticksuffix='%', showgrid=False))
+    return fig
+
+
+def display_rollup_table(rollups):
+    table = {"Period": [rollup.label for rollup in rollups], "Weeks": [len(rollup.weeks) for rollup in rollups]}
+    for collection in collections:
+        table[collection.title()] = [
+            f"{rollup.articles[collection]} ({100 * rollup.articles[collection] / max(rollup.total_articles, 1):.1f}%)"
+            for rollup in rollups
+        ]
+    table["All articles"] = [rollup.total_articles for rollup in rollups]
+    st.dataframe(table, hide_index=True, use_container_width=True)
+
+
+def display_rollups():
+    st.markdown("#### Articles by period")
+    period = st.radio("Period:", ["Month", "Quarter", "Year", "Custom range"], horizontal=True)
+    if period != "Custom range":
+        display_rollup_table(get_period_rollups(data, period.lower()))
+        return
+
+    week_options = list(data.keys())
+    start_week, end_week = st.select_slider("Weeks:", options=week_options, value=(week_options[0], week_options[-1]),
+                                            key="rollup_weeks")
+    display_rollup_table([get_rollup(data, start_week, end_week)])
+
+
+def create_trend_page():
+    query_params = st.experimental_get_query_params()
+    group_name = query_params.get("collection", ["mostly left"])[0]
+
+    st.markdown("<h1>Attention Across All Weeks</h1>", unsafe_allow_html=True)
+
+    with st.spinner("Counting articles across the archive..."):
+        weeks, week_counts = get_attention(data)
+    if not weeks:
+        st.write("No weeks available.")
+        return
+    week_shares = shares(week_counts)
+
+    st.markdown("#### Share of each week's articles by collection")
+    st.plotly_chart(build_share_chart(weeks, week_shares), use_container_width=True)
+
+    group_options = list(group_colors.keys())
+    group_name = st.selectbox("Select a collection:", group_options, index=group_options.index(group_name))
+    st.markdown(
+        f"#### Weekly attention for <span style='color: {group_colors[group_name]};'>{group_name.title()}</span>",
+        unsafe_allow_html=True
+    )
+    st.plotly_chart(build_collection_chart(group_name, weeks, week_counts, week_shares), use_container_width=True)
+
+    display_rollups()
+
+    latest = weeks[-1]
+    week_id = latest.replace(' ', "%20")
+    group_id = group_name.replace(' ', "%20")
+    st.markdown(f"[Clusters for {group_name.title()} in {latest}](/collection_page?week={week_id}&collection={group_id})")
+
+profile_rerun = profile_requested(st.experimental_get_query_params())
+with perf.rerun('trend_page'), profiled('trend_page', profile_rerun):
+    create_trend_page()
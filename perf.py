@@ -0,0 +1,73 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Timings of the most recent reruns of every page, kept in a process-wide ring buffer.
+MAX_RERUNS = int(os.environ.get('MC_PERF_RERUNS', 500))
+
+_reruns = deque(maxlen=MAX_RERUNS)
+_reruns_lock = threading.Lock()
+# Streamlit runs each session's script on its own thread, so the rerun being timed is thread-local.
+_local = threading.local()
+
+
+@contextmanager
+def rerun(page):
+    # Times one execution of a page script. Reruns interrupted by Streamlit (a widget changed
+    # mid-run) raise through here and are not recorded.
+    current = {'page': page, 'started': time.time(), 'stages': {}}
+    _local.rerun = current
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        _local.rerun = None
+    current['total'] = time.perf_counter() - start
+    with _reruns_lock:
+        _reruns.append(current)
+
+
+@contextmanager
+def span(stage):
+    # Adds the time spent in the block to stage of the rerun running on this thread, if any.
+    # Spans of the same stage in one rerun add up.
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current = getattr(_local, 'rerun', None)
+        if current is not None:
+            current['stages'][stage] = current['stages'].get(stage, 0.0) + time.perf_counter() - start
+
+
+def recent_reruns(limit=None):
+    with _reruns_lock:
+        reruns = list(_reruns)
+    reruns.reverse()
+    return reruns if limit is None else reruns[:limit]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    # Nearest-rank percentile.
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def page_percentiles(reruns=None):
+    # {page: {stage: (count, p50, p95)}}, in seconds, with the whole rerun under 'total'.
+    reruns = recent_reruns() if reruns is None else reruns
+    samples = {}
+    for current in reruns:
+        page_samples = samples.setdefault(current['page'], {})
+        page_samples.setdefault('total', []).append(current['total'])
+        for stage, seconds in current['stages'].items():
+            page_samples.setdefault(stage, []).append(seconds)
+    return {
+        page: {stage: (len(values), percentile(values, 50), percentile(values, 95)) for stage, values in stages.items()}
+        for page, stages in samples.items()
+    }
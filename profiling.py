@@ -0,0 +1,79 @@
+import cProfile
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+from blob_cache import default_cache_dir
+
+# Opening a page with ?profile=1 runs that rerun under cProfile and saves the stats here as
+# <page>-<timestamp>.prof (readable with pstats or snakeviz). Only the newest MAX_PROFILES are kept.
+PROFILE_DIR = os.environ.get('MC_PROFILE_DIR', default_cache_dir('profiles'))
+MAX_PROFILES = int(os.environ.get('MC_MAX_PROFILES', 50))
+
+# cProfile cannot profile two threads at once, so a request that arrives while another rerun is
+# being profiled runs unprofiled.
+_profile_lock = threading.Lock()
+
+
+def profile_requested(query_params):
+    return query_params.get('profile', ['0'])[0] == '1'
+
+
+@contextmanager
+def profiled(page, enabled):
+    if not enabled or not _profile_lock.acquire(blocking=False):
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            save_profile(profiler, page)
+    finally:
+        _profile_lock.release()
+
+
+def save_profile(profiler, page):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S') + f'-{int(time.time() * 1000) % 1000:03d}'
+    path = os.path.join(PROFILE_DIR, f'{page}-{stamp}.prof')
+    profiler.dump_stats(path)
+    for old_name in list_profiles()[MAX_PROFILES:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, old_name))
+        except OSError:
+            pass
+    return path
+
+
+def list_profiles():
+    # Newest first.
+    try:
+        names = [name for name in os.listdir(PROFILE_DIR) if name.endswith('.prof')]
+    except OSError:
+        return []
+    return sorted(names, key=lambda name: name.rsplit('-', 3)[-3:], reverse=True)
+
+
+def profile_path(name):
+    return os.path.join(PROFILE_DIR, os.path.basename(name))
+
+
+def top_functions(name, limit=25, sort='cumulative'):
+    stats = pstats.Stats(profile_path(name)).stats
+    rows = []
+    for (file_name, line, function), (primitive_calls, calls, total, cumulative, _) in stats.items():
+        rows.append({
+            'function': function if file_name == '~' else f'{function} ({os.path.basename(file_name)}:{line})',
+            'calls': str(calls) if calls == primitive_calls else f'{calls}/{primitive_calls}',
+            'tottime (ms)': round(total * 1000, 2),
+            'cumtime (ms)': round(cumulative * 1000, 2),
+        })
+    key = 'cumtime (ms)' if sort == 'cumulative' else 'tottime (ms)'
+    return sorted(rows, key=lambda row: -row[key])[:limit]
@@ -0,0 +1,126 @@
+import functools
+import re
+
+import numpy as np
+
+from data_store import WeekIndex, register_week_index
+from helpers import collection_codes, collections, filter_stopwords
+
+# Full-text search over article titles. Each week has an inverted index from the lowercase tokens
+# helpers.remove_stopwords keeps (punctuation aside) to the sorted positions of the articles that contain
+# them, in the week's article order; cluster offsets and collection codes map a position back to
+# its cluster and collection. Weeks are indexed in the background as the store reads them.
+
+
+_word = re.compile(r'\w')
+
+
+@functools.lru_cache(maxsize=2 ** 17)
+def search_terms(text):
+    # Memoised per unique title; the same headline often shows up in several weeks and clusters.
+    return frozenset(token.lower() for token in filter_stopwords(text) if _word.search(token))
+
+
+class WeekPostings:
+    __slots__ = ('names', 'starts', 'codes', 'postings')
+
+    def __init__(self, clusters):
+        self.names = [cluster['name'] for cluster in clusters]
+        sizes = [len(cluster['articles']) for cluster in clusters]
+        # Position of the first article of each cluster.
+        self.starts = np.cumsum([0] + sizes[:-1]).astype(np.int64) if clusters else np.zeros(0, dtype=np.int64)
+        self.codes = np.concatenate([cluster['articles'].codes for cluster in clusters]) if clusters \
+            else np.zeros(0, dtype=np.int8)
+
+        postings = {}
+        position = 0
+        for cluster in clusters:
+            for title in cluster['articles'].titles:
+                for term in search_terms(title):
+                    postings.setdefault(term, []).append(position)
+                position += 1
+        self.postings = {term: np.array(positions, dtype=np.int32) for term, positions in postings.items()}
+
+    def match(self, terms, codes=None):
+        # Positions of the articles whose title has every term (and, if given, whose collection is in codes).
+        matches = None
+        for term in terms:
+            positions = self.postings.get(term)
+            if positions is None:
+                return np.zeros(0, dtype=np.int32)
+            matches = positions if matches is None else np.intersect1d(matches, positions, assume_unique=True)
+        if matches is None:
+            return np.zeros(0, dtype=np.int32)
+        if codes is not None:
+            matches = matches[np.isin(self.codes[matches], codes)]
+        return matches
+
+
+class SearchResult:
+    __slots__ = ('week', 'cluster', 'name', 'hits', 'collections')
+
+    def __init__(self, week, cluster, name, hits, collection_hits):
+        self.week = week
+        self.cluster = cluster
+        self.name = name
+        self.hits = hits
+        self.collections = {collection: count for collection, count in zip(collections, collection_hits) if count}
+
+    @property
+    def url(self):
+        week_id = self.week.replace(' ', "%20")
+        return f"/cluster_page?week={week_id}&cluster={self.cluster}"
+
+
+class SearchIndex(WeekIndex):
+
+    def __init__(self):
+        super().__init__()
+        self._weeks = {}
+
+    def build(self, week, clusters):
+        return WeekPostings(clusters)
+
+    def store(self, week, postings):
+        self._weeks[week] = postings
+
+    def drop(self, week):
+        del self._weeks[week]
+
+    def search(self, query, weeks, selected_collections=None):
+        # Clusters of weeks with titles matching every term of query, most matching articles first.
+        terms = query_terms(query)
+        if not terms:
+            return []
+        codes = None
+        if selected_collections is not None:
+            codes = [collection_codes[name] for name in selected_collections if name in collection_codes]
+        with self._lock:
+            indexed = [(week, self._weeks[week]) for week in weeks if week in self._weeks]
+
+        results = []
+        num_collections = len(collections)
+        for week, postings in indexed:
+            matches = postings.match(terms, codes)
+            if not len(matches):
+                continue
+            cluster_of = np.searchsorted(postings.starts, matches, side='right') - 1
+            pairs = cluster_of * num_collections + postings.codes[matches]
+            counts = np.bincount(pairs, minlength=len(postings.names) * num_collections).reshape(-1, num_collections)
+            for cluster in np.flatnonzero(counts.sum(axis=1)).tolist():
+                row = counts[cluster]
+                results.append(SearchResult(week, cluster, postings.names[cluster], int(row.sum()), row.tolist()))
+        return sorted(results, key=lambda result: -result.hits)
+
+
+def query_terms(query):
+    return sorted(search_terms(query))
+
+
+def search(data, query, weeks=None, selected_collections=None):
+    weeks = list(data) if weeks is None else weeks
+    search_index.ensure_weeks(data, weeks)
+    return search_index.search(query, weeks, selected_collections)
+
+
+search_index = register_week_index('search', SearchIndex, background=True)
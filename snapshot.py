@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+from io import BytesIO
+
+import numpy as np
+
+from articles import ArticleList, StringTable, Summary
+from helpers import SUMMARY_KEYS, cluster_term_frequencies, collections, list_week_files, load_week
+
+# Bump whenever the layout of the snapshot files or the output of process_week changes;
+# snapshots written by another version are ignored and the app falls back to the JSONL files.
+SNAPSHOT_VERSION = 4
+SNAPSHOT_DIR = '.snapshot'
+MANIFEST_NAME = 'manifest.json'
+
+
+def snapshot_path(data_path):
+    return os.path.join(data_path, SNAPSHOT_DIR, f'v{SNAPSHOT_VERSION}')
+
+
+def read_manifest(data_path):
+    try:
+        with open(os.path.join(snapshot_path(data_path), MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        return {}
+    return manifest.get('files', {})
+
+
+def _write_week(path, clusters, digest):
+    import pyarrow as pa
+
+    columns = {
+        'id': [c['id'] for c in clusters],
+        'name': [c['name'] for c in clusters],
+        'color': [c['color'] for c in clusters],
+        'article_counts': [c['article_counts'] for c in clusters],
+        'collection_counts': pa.array([c['collection_counts'] for c in clusters], type=pa.list_(pa.int64())),
+        'titles': pa.array([c['articles'].titles for c in clusters], type=pa.list_(pa.string())),
+        'urls': pa.array([c['articles'].urls for c in clusters], type=pa.list_(pa.string())),
+        'collection_codes': pa.array([c['collection_codes'] for c in clusters], type=pa.list_(pa.int8())),
+    }
+    # Summaries are small, loosely structured records; keeping them as JSON avoids schema
+    # inference failures when their fields differ between clusters.
+    for key in SUMMARY_KEYS:
+        columns[key] = [json.dumps(c[key].to_dict() if c[key] is not None else None) for c in clusters]
+    # Tokenising titles is too slow to do when a week is loaded, so the build does it once.
+    columns['term_frequencies'] = [json.dumps(cluster_term_frequencies(c)) for c in clusters]
+
+    table = pa.table(columns)
+    table = table.replace_schema_metadata({'snapshot_version': str(SNAPSHOT_VERSION), 'source_sha256': digest})
+
+    tmp_path = path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def _column_values(array):
+    # StringArray.to_pylist() builds an Arrow scalar per value, which for the article columns
+    # costs more than parsing the original JSONL; slicing the raw value buffer avoids that.
+    import pyarrow as pa
+
+    if array.null_count or not (pa.types.is_string(array.type) or pa.types.is_large_string(array.type)):
+        return array.to_pylist()
+    _, offsets_buffer, data_buffer = array.buffers()
+    offsets = memoryview(offsets_buffer).cast('q' if pa.types.is_large_string(array.type) else 'i')
+    offsets = offsets[array.offset:array.offset + len(array) + 1].tolist()
+    data = data_buffer.to_pybytes() if data_buffer is not None else b''
+    return [data[start:end].decode() for start, end in zip(offsets, offsets[1:])]
+
+
+def _list_column(table, name, intern):
+    array = table.column(name).combine_chunks()
+    return [intern(value) for value in _column_values(array.flatten())], array.offsets.to_pylist()
+
+
+def read_week(data_path, entry):
+    import pyarrow as pa
+
+    with pa.memory_map(os.path.join(snapshot_path(data_path), entry['snapshot'])) as source:
+        table = pa.ipc.open_file(source).read_all()
+
+    # Article columns are decoded in one pass per week and sliced per cluster.
+    intern = StringTable()
+    titles, title_offsets = _list_column(table, 'titles', intern)
+    urls, _ = _list_column(table, 'urls', intern)
+
+    codes = table.column('collection_codes').combine_chunks()
+    code_offsets = codes.offsets.to_pylist()
+    code_values = codes.flatten().to_numpy()
+
+    rows = table.drop_columns(['titles', 'urls', 'collection_codes']).to_pylist()
+    for idx, row in enumerate(rows):
+        start, end = title_offsets[idx], title_offsets[idx + 1]
+        row['collection_codes'] = code_values[code_offsets[idx]:code_offsets[idx + 1]]
+        row['articles'] = ArticleList(titles[start:end], urls[start:end], row['collection_codes'], collections)
+        row['collection_counts'] = np.array(row['collection_counts'])
+        row['distribution'] = dict(zip(collections, row['collection_counts'].tolist()))
+        for key in SUMMARY_KEYS:
+            row[key] = Summary.from_record(json.loads(row[key]), intern)
+        row['term_frequencies'] = json.loads(row['term_frequencies'])
+    return rows
+
+
+def build(data_path, log=print):
+    # Compiles every weekly JSONL file into an Arrow IPC file holding the processed clusters.
+    # Weeks whose source hash matches the existing manifest are not rebuilt.
+    out_path = snapshot_path(data_path)
+    os.makedirs(out_path, exist_ok=True)
+    previous = read_manifest(data_path)
+    files = {}
+
+    for file_name in list_week_files(data_path):
+        source = os.path.join(data_path, file_name)
+        stat = os.stat(source)
+        with open(source, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        entry = {
+            'snapshot': file_name.replace('.jsonl', '.arrow'),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': digest,
+        }
+
+        known = previous.get(file_name)
+        if known and known['sha256'] == digest and os.path.exists(os.path.join(out_path, known['snapshot'])):
+            log(f'{file_name}: up to date')
+        else:
+            _write_week(os.path.join(out_path, entry['snapshot']), load_week(BytesIO(content)), digest)
+            log(f'{file_name}: built')
+        files[file_name] = entry
+
+    for file_name, entry in previous.items():
+        if file_name not in files:
+            try:
+                os.remove(os.path.join(out_path, entry['snapshot']))
+            except OSError:
+                pass
+
+    manifest_path = os.path.join(out_path, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump({'version': SNAPSHOT_VERSION, 'files': files}, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return files
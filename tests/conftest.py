@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from data_store import DataStore
+from synthetic import write_synthetic_data
+
+
+@pytest.fixture
+def store(tmp_path):
+    # A store over three synthetic weeks of five clusters.
+    write_synthetic_data(str(tmp_path), 3, 5, 20)
+    store = DataStore(str(tmp_path))
+    yield store
+    store.close()
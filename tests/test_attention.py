@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from attention import AttentionMatrix
+from helpers import collections, week_name
+from synthetic import week_file_name
+
+WEEKS = [week_name(week_file_name(i)) for i in range(6)]
+
+
+@pytest.fixture
+def matrix():
+    matrix = AttentionMatrix()
+    # Stored out of order, like weeks read by different pages.
+    for i in [3, 0, 5, 1, 4, 2]:
+        cluster_counts = np.arange(2 * len(collections)).reshape(2, len(collections)) * (i + 1)
+        cluster_counts[1, i % len(collections)] = 0
+        matrix.store(WEEKS[i], ([f'a{i}', f'b{i}'], cluster_counts))
+    return matrix
+
+
+def summed(matrix, weeks):
+    # The rollup added up week by week.
+    rows = [matrix.weeks.index(week) for week in set(weeks) if week in matrix.weeks]
+    return matrix.counts[rows].sum(axis=0).tolist(), matrix.clusters[rows].sum(axis=0).tolist()
+
+
+@pytest.mark.parametrize('weeks', [
+    WEEKS[1:4],
+    WEEKS[:],
+    [WEEKS[2]],
+    [WEEKS[3], WEEKS[1], WEEKS[2]],
+    [WEEKS[0], WEEKS[2], WEEKS[4]],
+    [WEEKS[1], WEEKS[1], WEEKS[2]],
+    [WEEKS[1], WEEKS[1]],
+    [WEEKS[1], WEEKS[2], WEEKS[2], WEEKS[4]],
+    [WEEKS[0], WEEKS[3], WEEKS[2]],
+    [WEEKS[0], WEEKS[1], '2030-01-06 to 2030-01-12'],
+    ['2023-01-02 to 2023-01-08', WEEKS[0]],
+    ['not a week', WEEKS[5]],
+    [],
+])
+def test_rollup_matches_the_sum_of_its_weeks(matrix, weeks):
+    articles, clusters = matrix.rollup(weeks)
+    assert (articles.tolist(), clusters.tolist()) == summed(matrix, weeks)
+
+
+def test_rows_are_in_date_order(matrix):
+    assert matrix.weeks == WEEKS
+    matrix.drop(WEEKS[2])
+    assert matrix.weeks == WEEKS[:2] + WEEKS[3:]
+    articles, _ = matrix.rollup(WEEKS[1:4])
+    assert articles.tolist() == summed(matrix, [WEEKS[1], WEEKS[3]])[0]
@@ -0,0 +1,34 @@
+from blob_cache import BlobCache
+
+
+def test_memory_budget_spills_least_recently_used_to_disk(tmp_path):
+    cache = BlobCache(str(tmp_path), memory_bytes=250, disk_bytes=1000)
+    for key in 'abc':
+        cache.set(key, key.encode() * 100)
+
+    stats = cache.stats()
+    assert stats['memory_bytes'] <= 250
+    assert stats['disk_entries'] == 1
+    assert (tmp_path / 'a').exists()
+    assert cache.get('a') == b'a' * 100
+    assert cache.stats()['disk_hits'] == 1
+
+
+def test_disk_budget_prunes_least_recently_used_files(tmp_path):
+    cache = BlobCache(str(tmp_path), memory_bytes=0, disk_bytes=250, write_through=True)
+    for key in 'abcd':
+        cache.set(key, key.encode() * 100)
+
+    assert cache.stats()['disk_bytes'] <= 250
+    assert not (tmp_path / 'a').exists()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['c', 'd']
+
+
+def test_no_disk_budget_keeps_memory_only(tmp_path):
+    cache = BlobCache(str(tmp_path / 'cache'), memory_bytes=150, disk_bytes=0)
+    cache.set('a', b'a' * 100)
+    cache.set('b', b'b' * 100)
+
+    assert cache.get('a') is None
+    assert cache.get('b') == b'b' * 100
+    assert not (tmp_path / 'cache').exists()
@@ -0,0 +1,122 @@
+import os
+from collections import Counter
+
+import pytest
+
+from data_store import DataStore, WeekIndex, register_week_index
+from synthetic import week_file_name, write_synthetic_data, write_synthetic_week
+
+
+class ClusterCounts(WeekIndex):
+
+    def __init__(self):
+        super().__init__()
+        self.counts = {}
+        self.builds = Counter()
+
+    def build(self, week, clusters):
+        self.builds[week] += 1
+        return len(clusters)
+
+    def store(self, week, entry):
+        self.counts[week] = entry
+
+    def drop(self, week):
+        del self.counts[week]
+
+
+def rescan(store):
+    store._dirty = True
+    return store.get()
+
+
+def test_weeks_are_listed_without_loading(store):
+    data = store.get()
+    assert len(data) == 3
+    assert store.resident_weeks() == []
+
+
+def test_resident_weeks_are_bounded(tmp_path):
+    write_synthetic_data(str(tmp_path), 3, 5, 20)
+    store = DataStore(str(tmp_path), max_resident_weeks=2)
+    data = store.get()
+    for week in data:
+        data[week]
+
+    assert store.resident_weeks() == list(data)[1:]
+    store.close()
+
+
+def test_resident_bytes_are_bounded(tmp_path):
+    paths = write_synthetic_data(str(tmp_path), 3, 5, 20)
+    store = DataStore(str(tmp_path), max_resident_bytes=os.path.getsize(paths[0]) + os.path.getsize(paths[1]) // 2)
+    data = store.get()
+    weeks = list(data)
+    clusters = data[weeks[0]]
+    data[weeks[1]]
+    assert store.resident_weeks() == [weeks[1]]
+
+    # An evicted week is parsed again when it is next read.
+    assert data[weeks[0]] is not clusters
+    assert store.resident_weeks() == [weeks[0]]
+    store.close()
+
+
+def test_weeks_outside_the_catalog_are_missing(store):
+    data = store.get()
+    assert '2030-01-06 to 2030-01-12' not in data
+    with pytest.raises(KeyError):
+        data['2030-01-06 to 2030-01-12']
+
+
+@pytest.mark.parametrize('background', [False, True])
+def test_week_index_builds_each_week_once(store, tmp_path, background):
+    index = register_week_index(f'test:{tmp_path}:{background}', ClusterCounts, background=background)
+    data = store.get()
+    weeks = list(data)
+    data[weeks[0]]
+    index.ensure_weeks(data, weeks)
+    index.ensure_weeks(data, weeks)
+
+    assert index.counts == {week: 5 for week in weeks}
+    assert index.builds == Counter(weeks)
+
+    write_synthetic_week(str(tmp_path / week_file_name(1)), 7, 20, seed=1, week_index=1)
+    data = rescan(store)
+    assert weeks[1] not in index.counts
+    index.ensure_weeks(data, weeks)
+
+    assert index.counts[weeks[1]] == 7
+    assert index.builds == Counter(weeks) + Counter([weeks[1]])
+
+
+def test_half_written_file_keeps_the_previous_version(store, tmp_path):
+    data = store.get()
+    week = list(data)[1]
+    clusters = data[week]
+
+    path = tmp_path / week_file_name(1)
+    write_synthetic_week(str(path), 7, 20, seed=1, week_index=1)
+    content = path.read_bytes()
+    path.write_bytes(content[:len(content) // 2])
+    data = rescan(store)
+    assert data[week] is clusters
+
+    path.write_bytes(content)
+    data = rescan(store)
+    assert len(data[week]) == 7
+
+
+def test_half_written_new_file_is_read_once_complete(store, tmp_path):
+    path = tmp_path / week_file_name(3)
+    write_synthetic_week(str(path), 5, 20, week_index=3)
+    content = path.read_bytes()
+    path.write_bytes(content[:len(content) // 2])
+    data = rescan(store)
+    week = list(data)[3]
+    with pytest.raises(KeyError):
+        data[week]
+
+    path.write_bytes(content)
+    data = store.get()
+    assert len(data[week]) == 5
@@ -0,0 +1,59 @@
+import numpy as np
+
+from dedup import near_pairs, normalize_url, story_ids
+
+
+def test_normalize_url_keeps_the_query_without_tracking_parameters():
+    assert normalize_url('https://example.com/article.php?id=1') != normalize_url('https://example.com/article.php?id=2')
+    assert normalize_url('https://www.example.com/story/?utm_source=x&utm_medium=y&fbclid=z#top') == \
+        normalize_url('http://example.com/story')
+    assert normalize_url('https://example.com/a?id=1&utm_campaign=c&page=2') == \
+        normalize_url('https://m.example.com/a?page=2&id=1&gclid=g')
+
+
+def test_query_only_urls_are_separate_stories():
+    titles = ['Council approves new budget', 'Storm closes schools across the county']
+    urls = ['https://example.com/article.php?id=1', 'https://example.com/article.php?id=2']
+    assert story_ids(titles, urls).tolist() == [0, 1]
+
+
+def test_tracked_copies_are_one_story():
+    titles = ['Council approves new budget', 'Storm closes schools across the county']
+    urls = ['https://example.com/budget', 'https://example.com/budget?utm_source=twitter']
+    assert story_ids(titles, urls).tolist() == [0, 0]
+
+
+def test_rewritten_headlines_are_one_story():
+    rewrites = [
+        ('Senate passes budget ahead of shutdown deadline', 'Senate passes budget bill ahead of shutdown deadline'),
+        ('Senate passes budget ahead of shutdown deadline', 'Senate approves budget ahead of shutdown deadline'),
+        ('Fed cuts interest rates by half a percentage point', 'Federal Reserve cuts interest rates by half a percentage point'),
+        ('Trump found guilty on all 34 counts in hush money trial', 'Jury finds Trump guilty on all 34 counts in hush money trial'),
+        ('Judge delays Trump sentencing until after election', 'Judge postpones Trump sentencing until after election - CNN'),
+        ('Vance and Walz face off in vice presidential debate', 'Walz and Vance face off in VP debate'),
+    ]
+    for first, second in rewrites:
+        assert story_ids([first, second], ['https://a.com/1', 'https://b.com/2']).tolist() == [0, 0], (first, second)
+
+
+def test_headlines_on_the_same_topic_are_separate_stories():
+    titles = [
+        'Senate passes budget ahead of shutdown deadline',
+        'House Republicans split over Senate budget deal',
+        'Fed cuts interest rates by half a percentage point',
+        'Mortgage rates fall after Fed decision',
+        'Trump found guilty on all 34 counts in hush money trial',
+        'Trump vows to appeal hush money verdict',
+    ]
+    urls = [f'https://example.com/{i}' for i in range(len(titles))]
+    assert story_ids(titles, urls).tolist() == list(range(len(titles)))
+
+
+def test_near_pairs_finds_close_fingerprints():
+    rng = np.random.default_rng(0)
+    fingerprints = rng.integers(0, 2 ** 63, size=200, dtype=np.uint64)
+    # Copies of the first ten fingerprints with two bits flipped.
+    flipped = fingerprints[:10] ^ np.uint64(0b101)
+    pairs = near_pairs(np.concatenate([fingerprints, flipped]), max_distance=4)
+    assert {(i, i + 200) for i in range(10)} <= set(map(tuple, pairs.tolist()))
+    assert all(i < j for i, j in pairs.tolist())
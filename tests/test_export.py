@@ -0,0 +1,41 @@
+import csv
+import io
+import json
+
+import pyarrow.parquet as pq
+
+from export import EXPORT_COLUMNS, export_bytes, iter_csv, range_rows, week_rows
+
+
+def test_rows_follow_the_week_range_and_collections(store):
+    data = store.get()
+    weeks = list(data)
+
+    rows = list(range_rows(data, weeks[2], weeks[1]))
+    assert [row[0] for row in rows] == sorted(row[0] for row in rows)
+    assert {row[0] for row in rows} == set(weeks[1:])
+    assert len(rows) == sum(cluster['article_counts'] for week in weeks[1:] for cluster in data[week])
+    assert list(range_rows(data, weeks[0], '2030-01-06 to 2030-01-12')) == []
+
+    selected = list(week_rows(data, weeks[0], {'center'}))
+    assert selected and all(row[3] == 'center' for row in selected)
+    assert len(selected) == sum(cluster['distribution']['center'] for cluster in data[weeks[0]])
+
+
+def test_formats_hold_the_same_rows(store):
+    data = store.get()
+    rows = list(week_rows(data, list(data)[0]))
+
+    from_csv = list(csv.reader(io.StringIO(export_bytes(rows, 'csv').decode())))
+    assert from_csv == [EXPORT_COLUMNS] + [list(row) for row in rows]
+    from_jsonl = [json.loads(line) for line in export_bytes(rows, 'jsonl').decode().splitlines()]
+    assert from_jsonl == [dict(zip(EXPORT_COLUMNS, row)) for row in rows]
+    from_parquet = pq.read_table(io.BytesIO(export_bytes(rows, 'parquet'))).to_pylist()
+    assert from_parquet == from_jsonl
+
+
+def test_csv_is_written_in_chunks():
+    rows = [('week', 'cluster', f'title {i}', 'center', f'https://example.com/{i}') for i in range(25)]
+    chunks = list(iter_csv(iter(rows), chunk_rows=10))
+    assert len(chunks) == 3
+    assert b''.join(chunks).decode().splitlines()[1:] == [','.join(row) for row in rows]
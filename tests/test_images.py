@@ -0,0 +1,174 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+import images
+from blob_cache import BlobCache
+
+
+def png_bytes():
+    buffer = BytesIO()
+    Image.new('RGB', (800, 600), 'red').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class Handler(BaseHTTPRequestHandler):
+    # /ok answers at once, /slow/<seconds> after a pause, /error with a 500, and /drip sends a
+    # byte every half second, so it never trips the read timeout.
+
+    def do_GET(self):
+        if self.path.startswith('/ok'):
+            self.send_image(png_bytes())
+        elif self.path.startswith('/slow/'):
+            time.sleep(float(self.path.split('?')[0].split('/')[2]))
+            self.send_image(png_bytes())
+        elif self.path.startswith('/error'):
+            self.send_response(500)
+            self.end_headers()
+        elif self.path.startswith('/drip'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', '100')
+            self.end_headers()
+            for _ in range(20):
+                try:
+                    self.wfile.write(b'x')
+                    self.wfile.flush()
+                except OSError:
+                    return
+                time.sleep(0.5)
+
+    def send_image(self, content):
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, 'thumbnail_store', BlobCache(str(tmp_path / 'thumbnails'), 1 << 20, 1 << 20, '.jpg'))
+    monkeypatch.setattr(images, '_failures', {})
+    monkeypatch.setattr(images, '_in_flight', {})
+    monkeypatch.setattr(images, '_queued_prefetches', set())
+
+
+def is_placeholder(content):
+    return content == images.placeholder_image()
+
+
+def test_deadline_returns_placeholders_for_slow_failing_and_dripping_hosts(server):
+    urls = [f'{server}/ok/1', f'{server}/slow/10', f'{server}/error', f'{server}/drip']
+    start = time.monotonic()
+    result = images.fetch_images(urls, timeout=1, deadline=3)
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 4
+    thumbnail = Image.open(BytesIO(result[0]))
+    assert thumbnail.format == 'JPEG'
+    assert thumbnail.width <= images.THUMBNAIL_SIZE[0] and thumbnail.height <= images.THUMBNAIL_SIZE[1]
+    assert all(is_placeholder(content) for content in result[1:])
+
+
+def test_downloads_run_in_parallel(server):
+    urls = [f'{server}/slow/1.5?{i}' for i in range(4)]
+    start = time.monotonic()
+    result = images.fetch_images(urls, timeout=5, deadline=5)
+
+    assert time.monotonic() - start < 3.5
+    assert not any(is_placeholder(content) for content in result)
+
+
+def test_failed_url_is_not_retried(server):
+    url = f'{server}/error'
+    images.fetch_images([url], timeout=1, deadline=3)
+    assert images._recently_failed(url)
+
+    start = time.monotonic()
+    assert is_placeholder(images.fetch_images([url], timeout=1, deadline=3)[0])
+    assert time.monotonic() - start < 0.5
+
+
+def test_thumbnails_are_served_from_the_store(server):
+    url = f'{server}/ok/2'
+    first = images.fetch_images([url], timeout=1, deadline=3)[0]
+    assert images.thumbnail_store.get(images.url_key(url)) == first
+
+    server_down = url.replace(server, 'http://127.0.0.1:9')
+    images.thumbnail_store.set(images.url_key(server_down), first)
+    assert images.fetch_images([server_down], timeout=1, deadline=3)[0] == first
+
+
+def test_loaded_week_yields_its_image_urls(store):
+    from synthetic import IMAGE_URL
+
+    data = store.get()
+    clusters = data[list(data)[0]]
+
+    assert images.week_image_urls(clusters) == [IMAGE_URL]
+
+
+def test_prefetched_thumbnails_survive_a_restart(server, tmp_path, monkeypatch):
+    path = str(tmp_path / 'prefetched')
+    monkeypatch.setattr(images, 'thumbnail_store', BlobCache(path, 1 << 20, 1 << 20, '.jpg', write_through=True))
+    urls = [f'{server}/ok/prefetch?{i}' for i in range(3)]
+    clusters = [{'mostly_left_summary': {'image_url': url}, 'center_summary': {'image_url': urls[0]}} for url in urls]
+
+    images.prefetch_week('week', clusters)
+    # Thumbnails are stored by a done callback, which may run just after the download returns.
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and not all(images.url_key(url) in images.thumbnail_store for url in urls):
+        time.sleep(0.05)
+
+    restarted = BlobCache(path, 1 << 20, 1 << 20, '.jpg')
+    assert all(images.url_key(url) in restarted for url in urls)
+    assert restarted.get(images.url_key(urls[0])).startswith(b'\xff\xd8')
+
+
+def test_render_does_not_wait_behind_the_prefetch_queue(server):
+    urls = [f'{server}/slow/1?{i}' for i in range(40)]
+    prefetches = [images._start_download(url, 5, prefetch=True) for url in urls]
+    try:
+        start = time.monotonic()
+        result = images.fetch_images([urls[-1]], timeout=5, deadline=2.5)
+        assert time.monotonic() - start < 2.5
+        assert not is_placeholder(result[0])
+        assert prefetches[-1].cancelled()
+    finally:
+        for future in prefetches:
+            future.cancel()
+
+
+def test_prefetch_queue_is_bounded(server, monkeypatch):
+    monkeypatch.setattr(images, 'PREFETCH_QUEUE_SIZE', 10)
+    prefetches = [images._start_download(f'{server}/slow/1?{i}', 5, prefetch=True) for i in range(30)]
+    try:
+        queued = [future for future in prefetches if future is not None]
+        assert len(queued) <= 10 + images.PREFETCH_WORKERS
+        assert len(images._queued_prefetches) <= 10
+    finally:
+        for future in prefetches:
+            if future is not None:
+                future.cancel()
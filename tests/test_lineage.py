@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from data_store import DataStore
+from lineage import LineageIndex, get_lineage, lineage_index
+
+WEEKS = ['2024-07-01 to 2024-07-07', '2024-07-08 to 2024-07-14', '2024-07-15 to 2024-07-21']
+# Stories that run through every week, and one unrelated story per week.
+STORIES = [
+    ['Hurricane Milton makes landfall near Tampa', 'Milton floods Tampa Bay neighborhoods',
+     'Tampa residents return after hurricane Milton'],
+    ['Senate budget deal averts shutdown deadline', 'Shutdown deadline looms as Senate budget talks stall',
+     'Senate passes budget ahead of shutdown deadline'],
+]
+ONE_OFFS = ['Olympic swimmer sets world record in relay', 'Museum unveils restored medieval tapestry',
+            'Vaccine trial reports strong early results']
+
+
+def cluster(cluster_id, name, titles):
+    return {'id': cluster_id, 'name': name, 'articles': [
+        {'title': title, 'url': f'https://example.com/{cluster_id}/{i}', 'collection': 'center'}
+        for i, title in enumerate(titles)]}
+
+
+@pytest.fixture
+def data(tmp_path):
+    for week_index, week in enumerate(WEEKS):
+        records = [cluster(i, f'{name} {week_index}', [title + suffix for title in titles for suffix in ('', ' - AP')])
+                   for i, (name, titles) in enumerate([('milton', STORIES[0]), ('budget', STORIES[1]),
+                                                       ('other', [ONE_OFFS[week_index]] * 3)])]
+        with open(tmp_path / f'{week}.jsonl', 'w') as f:
+            f.write('\n'.join(json.dumps(record) for record in records))
+    yield DataStore(str(tmp_path)).get()
+    lineage_index.clear()
+
+
+def test_chain_follows_a_story_across_weeks(data):
+    index = LineageIndex()
+    for week in WEEKS:
+        index.ingest(week, data[week])
+
+    predecessors, successors = index.chain(WEEKS[1], 0, WEEKS)
+    assert [link[2] for link in predecessors] == ['milton 0']
+    assert [link[2] for link in successors] == ['milton 2']
+    assert index.chain(WEEKS[1], 2, WEEKS) == ([], [])
+
+
+def test_changed_week_is_dropped_from_the_buckets(data):
+    index = LineageIndex()
+    for week in WEEKS:
+        index.ingest(week, data[week])
+    index.invalidate([WEEKS[2]])
+
+    predecessors, successors = index.chain(WEEKS[1], 1, WEEKS)
+    assert [link[:3] for link in predecessors] == [(WEEKS[0], 1, 'budget 0')]
+    assert successors == []
+    assert index.indexed_weeks(WEEKS) == WEEKS[:2]
+
+
+def test_get_lineage_does_not_read_neighbouring_weeks(data):
+    store = data._store
+    predecessors, successors, unindexed = get_lineage(data, WEEKS[1], 0)
+
+    assert (predecessors, successors) == ([], [])
+    assert unindexed == [WEEKS[0], WEEKS[2]]
+    assert store.resident_weeks() == [WEEKS[1]]
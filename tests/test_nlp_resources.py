@@ -0,0 +1,37 @@
+import pytest
+
+import nlp_resources
+
+
+@pytest.fixture
+def fresh_resources():
+    nlp_resources.get_stop_words.cache_clear()
+    nlp_resources.get_tokenizer.cache_clear()
+    yield
+    nlp_resources.get_stop_words.cache_clear()
+    nlp_resources.get_tokenizer.cache_clear()
+
+
+def test_missing_data_falls_back_to_bundled_resources(fresh_resources, monkeypatch):
+    monkeypatch.setattr(nlp_resources, '_has_resource', lambda resource: False)
+
+    with pytest.warns(UserWarning):
+        status = nlp_resources.check_resources()
+    assert (status['stopwords'], status['tokenizer']) == ('bundled', 'regex')
+    assert nlp_resources.get_stop_words() is nlp_resources.BUNDLED_STOP_WORDS
+    assert nlp_resources.get_tokenizer() is nlp_resources.regex_tokenize
+
+
+def test_unreadable_data_is_treated_as_missing(monkeypatch):
+    class BrokenData:
+        @staticmethod
+        def find(resource):
+            raise OSError(resource)
+
+    monkeypatch.setattr(nlp_resources, '_nltk_data', lambda: BrokenData)
+    assert not nlp_resources._has_resource('tokenizers/punkt_tab/english/')
+
+
+def test_regex_tokenizer_splits_like_the_treebank_tokenizer():
+    assert nlp_resources.regex_tokenize("Trump's rally didn't stop, officials say") == \
+        ['Trump', "'s", 'rally', 'did', "n't", 'stop', ',', 'officials', 'say']
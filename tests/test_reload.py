@@ -0,0 +1,53 @@
+import os
+
+from data_store import register_week_cache
+from synthetic import week_file_name, write_synthetic_week
+
+
+def rescan(store):
+    store._dirty = True
+    return store.get()
+
+
+def test_changed_file_only_invalidates_its_week(store, tmp_path):
+    cache = register_week_cache(f'test:{tmp_path}')
+    data = store.get()
+    weeks = list(data)
+    before = {week: data[week] for week in weeks}
+    for week in weeks:
+        cache.set(week, 'value', week)
+
+    write_synthetic_week(str(tmp_path / week_file_name(1)), 5, 20, seed=1, week_index=1)
+    data = rescan(store)
+
+    assert data[weeks[0]] is before[weeks[0]]
+    assert data[weeks[2]] is before[weeks[2]]
+    assert data[weeks[1]] is not before[weeks[1]]
+    assert [cache.get(week, 'value') for week in weeks] == [weeks[0], None, weeks[2]]
+
+
+def test_touched_file_keeps_its_week(store, tmp_path):
+    cache = register_week_cache(f'test:{tmp_path}')
+    data = store.get()
+    week = list(data)[0]
+    clusters = data[week]
+    cache.set(week, 'value', 1)
+
+    path = tmp_path / week_file_name(0)
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10 ** 9))
+    data = rescan(store)
+
+    assert data[week] is clusters
+    assert cache.get(week, 'value') == 1
+
+
+def test_removed_file_drops_its_week(store, tmp_path):
+    data = store.get()
+    week = list(data)[2]
+    data[week]
+
+    os.remove(tmp_path / week_file_name(2))
+    data = rescan(store)
+
+    assert week not in data
+    assert week not in store.resident_weeks()
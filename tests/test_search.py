@@ -0,0 +1,49 @@
+import json
+from io import BytesIO
+
+from helpers import collections, load_week
+from search import SearchIndex, query_terms
+from synthetic import COLLECTIONS
+
+
+def week(*clusters):
+    lines = [json.dumps({'id': i, 'name': name, 'articles': [
+        {'title': title, 'url': f'https://example.com/{i}/{j}', 'collection': COLLECTIONS[j % len(COLLECTIONS)]}
+        for j, title in enumerate(titles)
+    ]}) for i, (name, titles) in enumerate(clusters)]
+    return tuple(load_week(BytesIO('\n'.join(lines).encode())))
+
+
+def test_query_terms_keep_numbers_and_drop_stopwords():
+    assert query_terms('The 2024 Election') == ['2024', 'election']
+
+
+def test_search_matches_every_term_including_numbers():
+    index = SearchIndex()
+    index.ingest('w1', week(
+        ('vote', ['Polls open for the 2024 election', 'Election night in 2024', 'Election results delayed']),
+        ('budget', ['Budget for 2024 passes', 'Senate debates budget']),
+    ))
+
+    results = index.search('2024', ['w1'])
+    assert [(result.name, result.hits) for result in results] == [('vote', 2), ('budget', 1)]
+    assert [result.name for result in index.search('2024 election', ['w1'])] == ['vote']
+    assert index.search('2024 senate', ['w1']) == []
+
+
+def test_search_filters_collections():
+    index = SearchIndex()
+    index.ingest('w1', week(('vote', ['Election today', 'Election today', 'Election today'])))
+
+    result, = index.search('election', ['w1'], collections[:1])
+    assert result.hits == 1
+    assert list(result.collections) == collections[:1]
+
+
+def test_result_url_is_a_markdown_link_target():
+    index = SearchIndex()
+    index.ingest('2024-07-08 to 2024-07-14', week(('vote', ['Election today'])))
+
+    result, = index.search('election', ['2024-07-08 to 2024-07-14'])
+    assert result.url == '/cluster_page?week=2024-07-08%20to%202024-07-14&cluster=0'
+    assert ' ' not in result.url
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+
+import snapshot
+from data_store import DataStore
+from helpers import SUMMARY_KEYS, load_week, week_name
+from synthetic import week_file_name, write_synthetic_data, write_synthetic_week
+
+
+def test_snapshot_round_trip(tmp_path):
+    paths = write_synthetic_data(str(tmp_path), 2, 5, 20)
+    files = snapshot.build(str(tmp_path), log=lambda message: None)
+
+    for path in paths:
+        expected = load_week(path)
+        clusters = snapshot.read_week(str(tmp_path), files[os.path.basename(path)])
+        assert len(clusters) == len(expected)
+        for cluster, original in zip(clusters, expected):
+            for key in ('id', 'name', 'color', 'article_counts', 'distribution'):
+                assert cluster[key] == original[key]
+            assert np.array_equal(cluster['collection_counts'], original['collection_counts'])
+            for column in ('titles', 'urls', 'collections'):
+                assert list(getattr(cluster['articles'], column)) == list(getattr(original['articles'], column))
+            for key in SUMMARY_KEYS:
+                assert cluster[key].to_dict() == original[key].to_dict()
+            assert cluster['term_frequencies']
+
+
+def test_build_only_rebuilds_changed_weeks(tmp_path):
+    write_synthetic_data(str(tmp_path), 3, 5, 20)
+    snapshot.build(str(tmp_path), log=lambda message: None)
+
+    write_synthetic_week(str(tmp_path / week_file_name(1)), 5, 20, seed=1, week_index=1)
+    os.remove(tmp_path / week_file_name(2))
+    messages = []
+    files = snapshot.build(str(tmp_path), log=messages.append)
+
+    assert messages == [f'{week_file_name(0)}: up to date', f'{week_file_name(1)}: built']
+    assert sorted(os.listdir(snapshot.snapshot_path(str(tmp_path)))) == \
+        sorted([entry['snapshot'] for entry in files.values()] + [snapshot.MANIFEST_NAME])
+
+
+def test_store_reads_snapshots_of_unchanged_weeks_only(tmp_path):
+    write_synthetic_data(str(tmp_path), 2, 5, 20)
+    snapshot.build(str(tmp_path), log=lambda message: None)
+    # Changed after the build: the snapshot of this week is stale.
+    write_synthetic_week(str(tmp_path / week_file_name(1)), 7, 20, seed=1, week_index=1)
+
+    store = DataStore(str(tmp_path))
+    data = store.get()
+    fresh, changed = (data[week_name(week_file_name(i))] for i in range(2))
+    store.close()
+
+    # Only snapshots carry the term frequencies computed by the build.
+    assert all('term_frequencies' in cluster for cluster in fresh)
+    assert len(changed) == 7 and not any('term_frequencies' in cluster for cluster in changed)
@@ -0,0 +1,34 @@
+from datetime import date
+
+from week_catalog import WeekCatalog, parse_week
+
+WEEKS = ['2024-07-08 to 2024-07-14', '2024-07-15 to 2024-07-21', '2024-07-29 to 2024-08-04',
+         '2024-09-30 to 2024-10-06', '2025-01-06 to 2025-01-12']
+
+
+def test_weeks_are_ordered_by_date_with_undated_keys_last():
+    catalog = WeekCatalog(['notes', WEEKS[3], '2024-7-1 to 2024-7-7', WEEKS[0], 'archive', WEEKS[1]])
+    assert list(catalog) == ['2024-7-1 to 2024-7-7', WEEKS[0], WEEKS[1], WEEKS[3], 'archive', 'notes']
+    assert catalog.dates('notes') is None
+    assert parse_week('2024-07-08%20to%202024-07-14') == (date(2024, 7, 8), date(2024, 7, 14))
+
+
+def test_range_queries():
+    catalog = WeekCatalog(reversed(WEEKS + ['notes']))
+    assert catalog.between(WEEKS[3], WEEKS[1]) == WEEKS[1:4]
+    assert catalog.up_to(WEEKS[2]) == WEEKS[:3]
+    assert catalog.up_to(WEEKS[0]) == WEEKS[:1]
+    assert catalog.between_dates(date(2024, 7, 20), date(2024, 8, 1)) == WEEKS[1:3]
+    assert catalog.between_dates(date(2024, 8, 5), date(2024, 9, 29)) == []
+
+
+def test_periods():
+    catalog = WeekCatalog(WEEKS)
+    assert [label for label, _, _ in catalog.periods('month')] == ['2024-07', '2024-09', '2025-01']
+    assert catalog.periods('quarter') == [
+        ('2024 Q3', date(2024, 7, 8), date(2024, 10, 6)),
+        ('2025 Q1', date(2025, 1, 6), date(2025, 1, 12)),
+    ]
+    # A week counts in the period it starts in.
+    assert [catalog.period_weeks(start, end) for _, start, end in catalog.periods('year')] == [WEEKS[:4], WEEKS[4:]]
+    assert catalog.period_weeks(*catalog.periods('month')[0][1:]) == WEEKS[:3]
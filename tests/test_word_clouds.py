@@ -0,0 +1,36 @@
+import pytest
+
+import word_clouds
+from blob_cache import BlobCache
+from word_clouds import RENDER_SETTINGS, get_word_cloud_png, word_cloud_key
+
+
+@pytest.fixture
+def renders(tmp_path, monkeypatch):
+    monkeypatch.setattr(word_clouds, 'png_cache', BlobCache(str(tmp_path), memory_bytes=10 ** 6, disk_bytes=10 ** 6))
+    calls = []
+
+    def render(frequencies, settings):
+        calls.append(frequencies)
+        return f'png {sorted(frequencies.items())}'.encode()
+
+    monkeypatch.setattr(word_clouds, 'render_word_cloud_png', render)
+    return calls
+
+
+def test_key_depends_on_content_only():
+    assert word_cloud_key({'vote': 3, 'court': 1}) == word_cloud_key({'court': 1, 'vote': 3})
+    assert word_cloud_key({'vote': 3}) != word_cloud_key({'vote': 2})
+    assert word_cloud_key({'vote': 3}) != word_cloud_key({'vote': 3}, dict(RENDER_SETTINGS, colormap='viridis'))
+
+
+def test_identical_clouds_are_rendered_once(renders):
+    first = get_word_cloud_png({'vote': 3, 'court': 1})
+    assert get_word_cloud_png({'court': 1, 'vote': 3}) == first
+    get_word_cloud_png({'vote': 2})
+    assert renders == [{'vote': 3, 'court': 1}, {'vote': 2}]
+
+
+def test_rendered_png():
+    png = word_clouds.render_word_cloud_png({'vote': 3, 'court': 1}, dict(RENDER_SETTINGS, width=200, height=100))
+    assert png.startswith(b'\x89PNG')
@@ -0,0 +1,97 @@
+import random
+
+from data_store import register_week_cache
+from perf import span
+from helpers import collections
+from dedup import week_story_counts
+
+# Everything the treemaps, hover texts and sample lists need for one week, built once per week
+# and shared by home.py and collection_page.py. Dropped by the store when the week's file changes.
+_week_views = register_week_cache('view_model.week_views')
+_week_stories = register_week_cache('view_model.week_stories')
+
+
+def wrap_text(text, max_words=3):
+    words = text.split()
+    wrapped_text = '<br>'.join([' '.join(words[i:i + max_words]) for i in range(0, len(words), max_words)])
+    return wrapped_text
+
+
+def sample_titles(articles, num_samples=5):
+    sampled_articles = random.sample(articles, min(num_samples, len(articles)))
+    return "<br>".join([f"- {article['title']}" for article in sampled_articles])
+
+
+def summary_headline(cluster, collection):
+    summary = cluster.get(f"{collection.replace(' ', '_').strip()}_summary")
+    if not summary or not summary.get('article'):
+        return cluster['name']
+    return summary['article']['title']
+
+
+class CollectionView:
+    def __init__(self, week, collection, clusters):
+        self.name = collection
+        self.counts = [cluster['distribution'][collection] for cluster in clusters]
+        self.total = sum(self.counts)
+        self.headlines = [summary_headline(cluster, collection) for cluster in clusters]
+        self.labels = [wrap_text(headline) for headline in self.headlines]
+        self.urls = [f"/cluster_page?week={week}&cluster={i}&collection={collection}" for i in range(len(clusters))]
+
+        articles = [cluster['articles'].select([collection]) for cluster in clusters]
+        self.samples = [sample_titles(cluster_articles) for cluster_articles in articles]
+        # The first five articles of this collection in every cluster, to draw random samples from.
+        self.sample_pool = [article for cluster_articles in articles for article in cluster_articles[:5]]
+
+
+class WeekView:
+    def __init__(self, week, clusters):
+        self.week = week
+        self.names = [cluster['name'] for cluster in clusters]
+        self.labels = [wrap_text(name) for name in self.names]
+        self.values = [cluster['article_counts'] for cluster in clusters]
+        self.total_articles = sum(self.values)
+        self.colors = [cluster['color'] for cluster in clusters]
+        self.urls = [f"/cluster_page?week={week}&cluster={i}" for i in range(len(clusters))]
+        self.samples = [sample_titles(cluster['articles']) for cluster in clusters]
+
+        self.index_by_name = {}
+        for i, cluster in enumerate(clusters):
+            self.index_by_name.setdefault(cluster['name'], i)
+
+        self.collections = {collection: CollectionView(week, collection, clusters) for collection in collections}
+
+
+def get_week_view(data, week):
+    view = _week_views.get(week, 'view')
+    if view is None:
+        generation = _week_views.generation(week)
+        clusters = data[week]
+        with span('view model'):
+            view = WeekView(week, clusters)
+        _week_views.set(week, 'view', view, generation)
+    return view
+
+
+class WeekStories:
+    # De-duplicated counterparts of WeekView.values and CollectionView.counts (see dedup.py), so the
+    # pages can switch between raw and unique-story counts without touching the articles again.
+    __slots__ = ('week', 'values', 'counts', 'total')
+
+    def __init__(self, week, clusters):
+        counts = week_story_counts(clusters)
+        self.week = week
+        self.values = [cluster['unique_counts'] for cluster in clusters]
+        self.counts = {collection: counts[:, i].tolist() for i, collection in enumerate(collections)}
+        self.total = sum(self.values)
+
+
+def get_week_stories(data, week):
+    stories = _week_stories.get(week, 'stories')
+    if stories is None:
+        generation = _week_stories.generation(week)
+        clusters = data[week]
+        with span('view model'):
+            stories = WeekStories(week, clusters)
+        _week_stories.set(week, 'stories', stories, generation)
+    return stories
@@ -0,0 +1,111 @@
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+# Week keys come from file names such as "2024-07-08_to_2024-07-14.jsonl". The catalog parses them
+# into start and end dates and keeps them in date order, so ranges of weeks are answered with a
+# bisect on the dates instead of comparing the key strings. Keys without a date are kept, after
+# the dated weeks and in name order, but never fall inside a date range.
+WEEK_PATTERN = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})(?:\s+to\s+(\d{4})-(\d{1,2})-(\d{1,2}))?')
+PERIODS = ('month', 'quarter', 'year')
+
+
+def parse_week(week):
+    # (start, end) dates of a week key, or None if it has none.
+    match = WEEK_PATTERN.search(week.replace('%20', ' '))
+    if match is None:
+        return None
+    try:
+        start = date(*map(int, match.group(1, 2, 3)))
+        end = date(*map(int, match.group(4, 5, 6))) if match.group(4) else start
+    except ValueError:
+        return None
+    return start, max(start, end)
+
+
+def week_sort_key(week):
+    dates = parse_week(week)
+    return (0, dates[0], week) if dates is not None else (1, date.max, week)
+
+
+def period_start(day, period):
+    if period == 'month':
+        return date(day.year, day.month, 1)
+    if period == 'quarter':
+        return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+    if period == 'year':
+        return date(day.year, 1, 1)
+    raise ValueError(f'unknown period {period!r}')
+
+
+def period_label(start, period):
+    if period == 'month':
+        return start.strftime('%Y-%m')
+    if period == 'quarter':
+        return f'{start.year} Q{(start.month - 1) // 3 + 1}'
+    return str(start.year)
+
+
+class WeekCatalog:
+
+    def __init__(self, weeks):
+        dated = []
+        undated = []
+        for week in weeks:
+            dates = parse_week(week)
+            if dates is None:
+                undated.append(week)
+            else:
+                dated.append((dates, week))
+        dated.sort()
+        self.dated_weeks = [week for _, week in dated]
+        self.starts = [dates[0] for dates, _ in dated]
+        self.ends = [dates[1] for dates, _ in dated]
+        self.weeks = self.dated_weeks + sorted(undated)
+        self.positions = {week: i for i, week in enumerate(self.weeks)}
+
+    def __len__(self):
+        return len(self.weeks)
+
+    def __iter__(self):
+        return iter(self.weeks)
+
+    def __contains__(self, week):
+        return week in self.positions
+
+    def dates(self, week):
+        i = self.positions[week]
+        if i >= len(self.dated_weeks):
+            return None
+        return self.starts[i], self.ends[i]
+
+    def span(self, start, end):
+        # (first, last) positions of the weeks that overlap the dates start..end, last exclusive.
+        return bisect_left(self.ends, start), bisect_right(self.starts, end)
+
+    def between_dates(self, start, end):
+        first, last = self.span(start, end)
+        return self.dated_weeks[first:last]
+
+    def between(self, start_week, end_week):
+        # Weeks from start_week to end_week inclusive, in date order, whichever way round they are given.
+        first, last = sorted((self.positions[start_week], self.positions[end_week]))
+        return self.weeks[first:last + 1]
+
+    def up_to(self, week):
+        return self.weeks[:self.positions[week] + 1]
+
+    def periods(self, period):
+        # [(label, start, end)] of every month, quarter or year with a week starting in it.
+        starts = sorted({period_start(day, period) for day in self.starts})
+        bounds = starts[1:] + [None]
+        result = []
+        for start, next_start in zip(starts, bounds):
+            first = bisect_left(self.starts, start)
+            last = bisect_left(self.starts, next_start) if next_start else len(self.starts)
+            result.append((period_label(start, period), self.starts[first], self.ends[last - 1]))
+        return result
+
+    def period_weeks(self, start, end):
+        # Weeks starting between start and end, so that every week falls in exactly one period.
+        return self.dated_weeks[bisect_left(self.starts, start):bisect_right(self.starts, end)]
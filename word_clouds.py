@@ -0,0 +1,46 @@
+import hashlib
+import json
+import os
+from io import BytesIO
+
+from blob_cache import BlobCache, default_cache_dir
+
+RENDER_SETTINGS = {
+    'width': 800,
+    'height': 400,
+    'background_color': 'white',
+    'colormap': 'gray',
+    'prefer_horizontal': 1.0,
+}
+
+# Rendered word clouds are compressed PNG bytes addressed by a hash of their term frequencies and
+# render settings, so identical clouds are rendered once no matter which week or cluster asks.
+png_cache = BlobCache(
+    os.environ.get('MC_WORDCLOUD_CACHE_DIR', default_cache_dir('wordclouds')),
+    memory_bytes=int(os.environ.get('MC_WORDCLOUD_MEMORY_BYTES', 32 * 1024 * 1024)),
+    disk_bytes=int(os.environ.get('MC_WORDCLOUD_DISK_BYTES', 256 * 1024 * 1024)),
+    suffix='.png',
+)
+
+
+def word_cloud_key(frequencies, settings=RENDER_SETTINGS):
+    payload = json.dumps([sorted(frequencies.items()), sorted(settings.items())], separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def render_word_cloud_png(frequencies, settings=RENDER_SETTINGS):
+    from wordcloud import WordCloud
+
+    image = WordCloud(**settings).generate_from_frequencies(frequencies).to_image()
+    buffer = BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def get_word_cloud_png(frequencies, settings=RENDER_SETTINGS):
+    key = word_cloud_key(frequencies, settings)
+    png = png_cache.get(key)
+    if png is None:
+        png = render_word_cloud_png(frequencies, settings)
+        png_cache.set(key, png)
+    return png